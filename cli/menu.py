@@ -25,12 +25,25 @@ logger = logging.getLogger(__name__)
 try:
     from data_sources.tso.unified_downloader import UnifiedTSODownloader
     from data_sources.tso.db_importer import TSODataImporter
-    from db.duckdb_connection import DuckDBConnection
+    from db.duckdb_connection import DuckDBConnection, close_pooled_connections
 except ImportError as e:
     logger.error(f"モジュールインポートエラー: {e}")
     logger.error("必要なモジュールがインポートできません。")
     sys.exit(1)
 
+# TSO選択メニューの項目（エリアコード順）。表示のたびにソートしないよう、インポート時に1回だけ作成する
+TSO_MENU_ITEMS = tuple(sorted({
+    "hokkaido": {"name": "Hokkaido Electric Power Network", "area_code": "1"},
+    "tohoku": {"name": "Tohoku Electric Power Network", "area_code": "2"},
+    "tepco": {"name": "TEPCO Power Grid", "area_code": "3"},
+    "chubu": {"name": "Chubu Electric Power Grid", "area_code": "4"},
+    "hokuriku": {"name": "Hokuriku Electric Power Company", "area_code": "5"},
+    "kansai": {"name": "Kansai Electric Power", "area_code": "6"},
+    "chugoku": {"name": "Chugoku Electric Power", "area_code": "7"},
+    "shikoku": {"name": "Shikoku Electric Power Company", "area_code": "8"},
+    "kyushu": {"name": "Kyushu Electric Power", "area_code": "9"}
+}.items(), key=lambda x: x[1]['area_code']))
+
 class Menu:
     def __init__(self):
         # 遅延importで循環参照を回避
@@ -97,18 +110,6 @@ class Menu:
 
     def _display_tso_choices(self):
         """TSO選択用の番号付きリストを表示します"""
-        tso_ids = {
-            "hokkaido": {"name": "Hokkaido Electric Power Network", "area_code": "1"},
-            "tohoku": {"name": "Tohoku Electric Power Network", "area_code": "2"},
-            "tepco": {"name": "TEPCO Power Grid", "area_code": "3"},
-            "chubu": {"name": "Chubu Electric Power Grid", "area_code": "4"},
-            "hokuriku": {"name": "Hokuriku Electric Power Company", "area_code": "5"},
-            "kansai": {"name": "Kansai Electric Power", "area_code": "6"},
-            "chugoku": {"name": "Chugoku Electric Power", "area_code": "7"},
-            "shikoku": {"name": "Shikoku Electric Power Company", "area_code": "8"},
-            "kyushu": {"name": "Kyushu Electric Power", "area_code": "9"}
-        }
-        
         print("\nTSO Area Selection:")
         print("-" * 60)
         print(f"{'No.':<4} {'Area Code':<10} {'TSO Name':<30}")
@@ -117,7 +118,7 @@ class Menu:
         tso_choice_map = {}
         
         # 番号付きでTSOリストを表示
-        for i, (tso_id, info) in enumerate(sorted(tso_ids.items(), key=lambda x: x[1]['area_code']), 1):
+        for i, (tso_id, info) in enumerate(TSO_MENU_ITEMS, 1):
             print(f"{i:<4} {info['area_code']:<10} {info['name']:<30}")
             tso_choice_map[str(i)] = tso_id
         
@@ -217,6 +218,11 @@ class Menu:
 
         print(f"\nExecuting command: {' '.join(command)}")
 
+        # サブプロセスが同じDBファイルを開けるよう、プール済みの接続のロックを解放する
+        # (ポータルの共有接続は次の操作で開き直される)
+        self.portal.close()
+        close_pooled_connections()
+
         try:
             # Run the script as a subprocess, ensuring the CWD is the project root
             result = subprocess.run(
@@ -273,6 +279,11 @@ class Menu:
         print("Please follow the prompts from the JMA script.")
         print("-" * 30) # Separator before JMA script output
 
+        # サブプロセスが同じDBファイルを開けるよう、プール済みの接続のロックを解放する
+        # (ポータルの共有接続は次の操作で開き直される)
+        self.portal.close()
+        close_pooled_connections()
+
         try:
             # Run the script as a subprocess
             # We don't capture output here as jma_historical.py is interactive
@@ -2,19 +2,22 @@
 import requests
 from datetime import datetime, timedelta
 import sys
-import time
-import random
 import csv
-import json
+import io
 import os
 from typing import Dict, List, Tuple, Optional, Any
 from pathlib import Path
 
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pv
+
 # Add the project root to the Python path to ensure proper imports
 project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.append(project_root)
 
 from db.duckdb_connection import DuckDBConnection
+from data_sources.jepx.rate_limit import AdaptiveDelay
 
 class JEPXBidDownloader:
     """
@@ -25,6 +28,8 @@ class JEPXBidDownloader:
     
     BASE_URL = "https://www.jepx.jp/js/csv_read.php"
     DIR_NAMES = ["spot_bid_curves", "spot_splitting_areas"]
+    # CSVの先頭6列 (日付, 時刻コード, 価格, 売り入札量, 買い入札量, エリア) を文字列で読み込む
+    CSV_COLUMNS = [f"f{i}" for i in range(6)]
     
     def __init__(self, db_path: str = None, read_only: bool = False):
         """
@@ -36,6 +41,8 @@ class JEPXBidDownloader:
         """
         # Database connection
         self.db = DuckDBConnection(db_path, read_only=read_only)
+        # リクエスト間隔（固定の待ち時間ではなく、応答に応じて調整する）
+        self.delay = AdaptiveDelay()
         
         # Ensure the necessary tables exist
         self._ensure_tables()
@@ -122,6 +129,7 @@ class JEPXBidDownloader:
         try:
             with requests.Session() as session:
                 response = session.get(self.BASE_URL, params=params, headers=headers)
+                self.delay.update(response.status_code, response.headers.get('Retry-After'))
                 if response.status_code == 200:
                     print(f"Downloaded: {dir_name}_{date_str}.csv")
                     self._record_download(dir_name, date, f"{dir_name}_{date_str}.csv", "success")
@@ -132,6 +140,7 @@ class JEPXBidDownloader:
                     return None
         except Exception as e:
             print(f"Error downloading {dir_name}_{date_str}.csv: {e}")
+            self.delay.on_throttled()
             self._record_download(dir_name, date, f"{dir_name}_{date_str}.csv", f"error: {str(e)}")
             return None
     
@@ -148,59 +157,110 @@ class JEPXBidDownloader:
             status
         ))
     
-    def process_csv_to_json(self, csv_text: str):
-        data = {}
-        reader = csv.reader(csv_text.splitlines())
-        for row in reader:
-            if len(row) < 6:
-                continue
-            date, slot, price, sell_qty, buy_qty, area_code = row[0], row[1], row[2], row[3], row[4], row[5]
-            # 型変換とバリデーション
+    def read_csv_table(self, content: bytes) -> pa.Table:
+        """
+        CSVのバイト列を読み込み、先頭6列 (f0〜f5) と行番号 (rn) の Arrow テーブルを返す。
+
+        通常は pyarrow のマルチスレッドのCSVリーダーで読み込む。UTF-8 として読めない場合は
+        Shift_JIS として読み直し、それでも読めない場合は不正なバイトを置換してから読み込む。
+        pyarrow は先頭行の列数に合わせるため、列数の異なる行がある場合や先頭行が6列未満の
+        場合は、csv.reader で6列固定に読み直す（不足分は NULL、余分な列は無視）。
+        """
+        skipped = 0
+
+        def skip_invalid_row(row) -> str:
+            nonlocal skipped
+            skipped += 1
+            return 'skip'
+
+        def read(source, encoding: str) -> pa.Table:
+            nonlocal skipped
+            skipped = 0
+            return pv.read_csv(
+                source,
+                read_options=pv.ReadOptions(encoding=encoding, autogenerate_column_names=True),
+                parse_options=pv.ParseOptions(invalid_row_handler=skip_invalid_row),
+                convert_options=pv.ConvertOptions(
+                    include_columns=self.CSV_COLUMNS,
+                    column_types={col: pa.string() for col in self.CSV_COLUMNS},
+                ),
+            )
+
+        try:
             try:
-                slot_int = int(slot)
-                area_code_int = int(area_code)
-            except ValueError:
+                table = read(pa.BufferReader(content), 'utf8')
+            except pa.ArrowInvalid:
+                try:
+                    table = read(pa.BufferReader(content), 'shift_jis')
+                except (pa.ArrowInvalid, UnicodeDecodeError):
+                    text = content.decode('shift_jis', errors='replace')
+                    table = read(io.BytesIO(text.encode('utf-8')), 'utf8')
+        except pa.ArrowKeyError:
+            # 先頭行が6列未満で f0〜f5 の一部が存在しない
+            table = None
+
+        if table is None or skipped:
+            table = self._read_csv_table_fixed(content)
+        # 同じキー内の入札の並びを元のCSVの行順に保つための行番号
+        return table.append_column('rn', pa.array(np.arange(table.num_rows)))
+
+    def _read_csv_table_fixed(self, content: bytes) -> pa.Table:
+        """
+        csv.reader で先頭6列を固定で読み込む（列数の揃っていないCSV用）。
+        空行は読み飛ばし、6列に満たない行は不足分を NULL にする。
+        """
+        try:
+            text = content.decode('utf-8')
+        except UnicodeDecodeError:
+            text = content.decode('shift_jis', errors='replace')
+
+        n_cols = len(self.CSV_COLUMNS)
+        columns = [[] for _ in range(n_cols)]
+        for row in csv.reader(io.StringIO(text, newline='')):
+            if not row:
                 continue
-            key = (date, slot_int, area_code_int)
-            order = {"price": price, "sell_qty": sell_qty, "buy_qty": buy_qty}
-            if key not in data:
-                data[key] = []
-            data[key].append(order)
-        records = []
-        for (date, slot, area_code), bids in data.items():
-            record = {
-                "id": f"{date}_{slot}_{area_code}",
-                "date": date,
-                "slot": slot,
-                "area_code": area_code,
-                "bid": bids
-            }
-            records.append(record)
-        return records
-    
-    def save_to_database(self, records):
-        for record in records:
-            try:
-                # デバッグ出力
-                print(f"Saving record: {record}")
-                query = """
-                    INSERT INTO jepx_bid_data (id, date, slot, area_code, bid)
-                    VALUES (?, ?, ?, ?, ?)
-                    ON CONFLICT(id) DO UPDATE SET bid=excluded.bid
-                """
-                self.db.execute_query(
-                    query,
-                    (
-                        str(record["id"]),
-                        str(record["date"]),
-                        int(record["slot"]),
-                        int(record["area_code"]),
-                        json.dumps(record["bid"])
-                    )
+            row = row[:n_cols] + [None] * (n_cols - len(row))
+            for values, value in zip(columns, row):
+                values.append(value)
+        return pa.table({col: pa.array(values, type=pa.string()) for col, values in zip(self.CSV_COLUMNS, columns)})
+
+    def save_csv(self, content: bytes) -> int:
+        """
+        CSVを読み込み、(日付, 時刻コード, エリア) ごとに入札をまとめて jepx_bid_data に保存する。
+
+        Arrow テーブルを一時ビューとして登録し、集約 (入札の JSON 配列化) と
+        挿入/更新を1回の INSERT ... ON CONFLICT で行う。時刻コードやエリアが
+        整数でない行 (ヘッダー行など) は除外する。
+
+        Returns:
+            挿入/更新したレコード数
+        """
+        table = self.read_csv_table(content)
+        if table.num_rows == 0:
+            return 0
+
+        view_name = 'tmp__jepx_bid_data'
+        self.db.register(view_name, table)
+        try:
+            row = self.db.execute_query(f"""
+                INSERT INTO jepx_bid_data (id, date, slot, area_code, bid)
+                SELECT
+                    date || '_' || slot || '_' || area_code,
+                    date, slot, area_code,
+                    to_json(list({{'price': price, 'sell_qty': sell_qty, 'buy_qty': buy_qty}} ORDER BY rn))
+                FROM (
+                    SELECT rn, f0 AS date, TRY_CAST(f1 AS INTEGER) AS slot, f2 AS price,
+                           f3 AS sell_qty, f4 AS buy_qty, TRY_CAST(f5 AS INTEGER) AS area_code
+                    FROM "{view_name}"
                 )
-            except Exception as e:
-                print(f"Error saving record to database: {e}")
-    
+                WHERE slot IS NOT NULL AND area_code IS NOT NULL
+                GROUP BY date, slot, area_code
+                ON CONFLICT(id) DO UPDATE SET bid=excluded.bid
+            """).fetchone()
+        finally:
+            self.db.drop_view(view_name)
+        return row[0] if row else 0
+
     def download_and_save(self, start_date: datetime, end_date: datetime) -> None:
         """
         Download files for a date range and save to database.
@@ -215,16 +275,13 @@ class JEPXBidDownloader:
                 content = self.download_csv(current_date, dir_name)
                 if content is not None:
                     try:
-                        text = content.decode('utf-8')
-                    except UnicodeDecodeError:
-                        text = content.decode('shift_jis', errors='replace')
-                    records = self.process_csv_to_json(text)
-                    self.save_to_database(records)
-                    print(f"Saved {dir_name} data for {current_date.strftime('%Y-%m-%d')} to database")
+                        saved = self.save_csv(content)
+                    except Exception as e:
+                        print(f"Error saving {dir_name} data to database: {e}")
+                        continue
+                    print(f"Saved {saved} {dir_name} records for {current_date.strftime('%Y-%m-%d')} to database")
             
-            sleep_time = random.randint(10, 20)
-            print(f"Sleeping for {sleep_time} seconds...")
-            time.sleep(sleep_time)
+            self.delay.sleep()
             current_date += timedelta(days=1)
 
 def download_csv(date: datetime, dir_name: str) -> Optional[bytes]:
@@ -250,8 +307,8 @@ def main():
     end_date_str = input("Enter end date (YYYY-MM-DD): ")
     
     try:
-        start_date = datetime.strptime(start_date_str, "%Y-%m-%d")
-        end_date = datetime.strptime(end_date_str, "%Y-%m-%d")
+        start_date = datetime.fromisoformat(start_date_str)
+        end_date = datetime.fromisoformat(end_date_str)
     except ValueError:
         print("Error: Dates must be in YYYY-MM-DD format.")
         sys.exit(1)
@@ -7,12 +7,10 @@ if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
 import requests
-import csv
-import io
-from decimal import Decimal, InvalidOperation
+import tempfile
 import chardet
-from db.duckdb_connection import DuckDBConnection
-from datetime import datetime
+from db.duckdb_connection import DuckDBConnection, read_schema_definition
+from typing import Optional
 import logging
 
 logger = logging.getLogger(__name__)
@@ -96,15 +94,23 @@ class JEPXDAPriceDownloader:
     
     with文で使用することで、ブロックを抜けた時に自動的にデータベース接続を閉じます。
     """
-    def __init__(self, db_path: str = None, read_only: bool = False):
+    def __init__(
+        self,
+        db_path: str = None,
+        read_only: bool = False,
+        db_connection: Optional[DuckDBConnection] = None
+    ):
         """
         初期化
         
         Args:
             db_path: データベースファイルのパス（省略時はデフォルト）
             read_only: 読み取り専用モードで接続する場合はTrue
+            db_connection: 共有するDB接続。指定した場合は db_path/read_only は使わず、終了時にも閉じない
         """
-        self.db = DuckDBConnection(db_path, read_only=read_only)
+        # 自分で作成した接続だけを終了時に閉じる
+        self._owns_db = db_connection is None
+        self.db = db_connection or DuckDBConnection(db_path, read_only=read_only)
         self._ensure_table()
     
     def __enter__(self):
@@ -115,15 +121,13 @@ class JEPXDAPriceDownloader:
         """コンテキストマネージャの終了処理"""
         # 明示的にDB接続をクローズ
         try:
-            if hasattr(self, 'db') and self.db is not None:
+            if getattr(self, '_owns_db', False) and self.db is not None:
                 self.db.close()
         except Exception as e:
             print(f"[WARN] JEPXDAPriceDownloaderのコンテキスト終了時のDB接続クローズでエラー: {e}")
 
     def _ensure_table(self):
-        schema_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "..", "db", "schema_definition.sql")
-        with open(schema_path, "r") as f:
-            schema_sql = f.read()
+        schema_sql = read_schema_definition()
         stmts = [stmt.strip() for stmt in schema_sql.split(';') if 'jepx_da_price' in stmt]
         for stmt in stmts:
             if stmt:
@@ -154,10 +158,9 @@ class JEPXDAPriceDownloader:
             f.write(raw_bytes)
         print(f"Saved raw CSV to {debug_csv_path}")
         
-        reader = csv.reader(io.StringIO(csv_text))
-        rows = list(reader)
+        lines = csv_text.splitlines()
         
-        if not rows:
+        if not lines:
             print("WARNING: No rows found in CSV")
             return 0
             
@@ -212,103 +215,81 @@ class JEPXDAPriceDownloader:
         
         print(f"Using direct column mapping: {column_mapping}")
         
-        # スキーマカラムに対応するインデックスを生成
-        col_idx_map = []
-        for col in SCHEMA_COLS:
-            idx = next((k for k, v in column_mapping.items() if v == col), None)
-            col_idx_map.append(idx)
-            if idx is None:
-                print(f"WARNING: Column {col} not mapped to any CSV index")
-                
-        print(f"First 10 schema cols: {SCHEMA_COLS[:10]}")
-        print(f"First 10 col_idx_map: {col_idx_map[:10]}")
-        
-        # 最初の行をサンプルとしてデバッグ出力
-        if len(rows) > 1:
-            sample_row = rows[1]
-            print(f"Sample row length: {len(sample_row)}")
-            print(f"Sample row first 15 values: {sample_row[:15]}")
-            
-            # 値の取得テスト
-            for j, col in enumerate(SCHEMA_COLS[:10]):  # 最初の10カラムだけ確認
-                idx = col_idx_map[j]
-                if idx is not None and idx < len(sample_row):
-                    print(f"Column {col} (idx={idx}): {sample_row[idx]}")
-                else:
-                    print(f"Column {col} has invalid index {idx}")
-                
-        header_row_index = -1
-        for i, row in enumerate(rows):
-            if row and row[0] == '年月日':
-                header_row_index = i
-                break
+        header_row_index = next(
+            (i for i, line in enumerate(lines) if line.split(',', 1)[0].strip('"') == '年月日'), -1
+        )
         
         if header_row_index == -1:
             print("ERROR: Header row with '年月日' not found in CSV.")
             return 0
 
-        data_rows = rows[header_row_index + 1:]
-        processed_count = 0
+        processed_count = self._upsert_csv(csv_text, column_mapping)
+        if processed_count == 0 and any(line.strip(', ') for line in lines[header_row_index + 1:]):
+            print("WARNING: CSV has data lines after the header, but no rows were stored.")
+        
+        print(f'JEPX day-ahead price data processed: {processed_count} rows.')
+        return processed_count
 
-        for row_num, row_data in enumerate(data_rows):
-            if not any(row_data):  # 空の行はスキップ
-                continue
-                
-            # valuesの初期化
-            values = [None] * len(SCHEMA_COLS) 
-            
-            temp_data = {}
-            for col_idx, schema_col_name in column_mapping.items():
-                if col_idx < len(row_data):
-                    raw_value = row_data[col_idx]
-                    # SCHEMA_COLSにおける正しいインデックスを見つける
-                    if schema_col_name in SCHEMA_COLS:
-                        target_idx = SCHEMA_COLS.index(schema_col_name)
-                        # 値の変換
-                        if schema_col_name == 'date':
-                            try:
-                                values[target_idx] = datetime.strptime(raw_value, '%Y/%m/%d').strftime('%Y-%m-%d')
-                            except ValueError:
-                                print(f"Warning: Invalid date format '{raw_value}' at row {header_row_index + 1 + row_num}. Skipping row.")
-                                continue # 次の行へ
-                        elif schema_col_name in INT_COLS:
-                            try:
-                                values[target_idx] = int(Decimal(raw_value)) if raw_value else None
-                            except (InvalidOperation, ValueError):
-                                values[target_idx] = None
-                        elif schema_col_name in DEC_COLS:
-                            try:
-                                values[target_idx] = Decimal(raw_value) if raw_value else None
-                            except InvalidOperation:
-                                values[target_idx] = None
-                        else:
-                            values[target_idx] = raw_value
-            
-            # date と slot が None の場合はスキップ (主キーなので必須)
-            date_idx = SCHEMA_COLS.index('date')
-            slot_idx = SCHEMA_COLS.index('slot')
-            if values[date_idx] is None or values[slot_idx] is None:
-                print(f"Warning: date or slot is None at row {header_row_index + 1 + row_num}. Skipping row.")
-                continue
+    def _upsert_csv(self, csv_text: str, column_mapping: dict) -> int:
+        """
+        CSVを DuckDB の read_csv で読み込み、jepx_da_price に1文で挿入/更新する。
 
-            date_val = values[date_idx]
-            slot_val = values[slot_idx]
+        行ごとの csv.reader + Decimal 変換の代わりに、DuckDB のネイティブCSVリーダーで
+        読み込みと型変換（TRY_CAST）を行う。JEPX の CSV は Shift_JIS のため、
+        デコード済みのテキストを UTF-8 の一時ファイルに書き出してから読み込む。
+        方言の自動検出は行の列数の揺れで失敗するため使わず、区切り文字と列を固定し、
+        列の過不足は null_padding / strict_mode=false で吸収する。
+        ヘッダー行 ('年月日') より後の行のみを対象とし、日付・時刻コードが解釈できない行は
+        除外する。同じ (date, slot) が複数ある場合は後の行の値を採用し、
+        行グループのゾーンマップが効くよう (date, slot) 順に挿入する。
 
-            # データベースへの挿入/更新
-            select_sql = 'SELECT 1 FROM jepx_da_price WHERE date=? AND slot=?'
-            exists = self.db.execute_query(select_sql, (date_val, slot_val)).fetchone()
-            if exists:
-                set_clause = ','.join([f'{col}=?' for col in SCHEMA_COLS if col not in ['date', 'slot']])
-                update_sql = f'UPDATE jepx_da_price SET {set_clause} WHERE date=? AND slot=?'
-                update_values = [values[i] for i, col in enumerate(SCHEMA_COLS) if col not in ['date', 'slot']] + [date_val, slot_val]
-                self.db.execute_query(update_sql, tuple(update_values))
+        Returns:
+            挿入/更新した行数
+        """
+        n_cols = max(column_mapping) + 1
+        csv_columns = '{' + ', '.join(f"'c{i}': 'VARCHAR'" for i in range(n_cols)) + '}'
+        index_by_col = {col: idx for idx, col in column_mapping.items()}
+        exprs = []
+        for col in SCHEMA_COLS:
+            idx = index_by_col.get(col)
+            if idx is None:
+                exprs.append(f'NULL AS {col}')
+            elif col == 'date':
+                exprs.append(f"strftime(try_strptime(c{idx}, '%Y/%m/%d'), '%Y-%m-%d') AS {col}")
+            elif col in INT_COLS:
+                exprs.append(f'TRY_CAST(trunc(TRY_CAST(c{idx} AS DECIMAL(38,6))) AS BIGINT) AS {col}')
+            elif col in DEC_COLS:
+                exprs.append(f'TRY_CAST(c{idx} AS DECIMAL(38,6)) AS {col}')
             else:
-                insert_sql = f'INSERT INTO jepx_da_price ({','.join(SCHEMA_COLS)}) VALUES ({','.join(['?' for _ in SCHEMA_COLS])})'
-                self.db.execute_query(insert_sql, tuple(values))
-            processed_count += 1
-        
-        print(f'JEPX day-ahead price data processed: {processed_count} rows.')
-        return processed_count
+                exprs.append(f'c{idx} AS {col}')
+
+        columns = ','.join(SCHEMA_COLS)
+        set_clause = ','.join(f'{col}=excluded.{col}' for col in SCHEMA_COLS if col not in ('date', 'slot'))
+        # parallel=false で読み込み順を保ち、row_number() で行番号 (ヘッダー判定と後の行の優先) を付ける
+        sql = (
+            f'INSERT INTO jepx_da_price ({columns}) '
+            f'WITH src AS ('
+            f'SELECT row_number() OVER () AS rn, * '
+            f"FROM read_csv(?, header=false, auto_detect=false, delim=',', quote='\"', escape='\"', "
+            f'null_padding=true, strict_mode=false, parallel=false, columns={csv_columns})'
+            f') '
+            f'SELECT {columns} FROM ('
+            f'SELECT rn, {", ".join(exprs)} FROM src '
+            f"WHERE rn > (SELECT min(rn) FROM src WHERE c0 = '年月日')"
+            f') WHERE date IS NOT NULL AND slot IS NOT NULL '
+            f'QUALIFY row_number() OVER (PARTITION BY date, slot ORDER BY rn DESC) = 1 '
+            f'ORDER BY date, slot '
+            f'ON CONFLICT (date, slot) DO UPDATE SET {set_clause}'
+        )
+
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', encoding='utf-8', newline='', delete=False) as f:
+            f.write(csv_text)
+            tmp_path = f.name
+        try:
+            row = self.db.execute_query(sql, (tmp_path,)).fetchone()
+        finally:
+            os.remove(tmp_path)
+        return row[0] if row else 0
 
 if __name__ == "__main__":
     with JEPXDAPriceDownloader() as downloader:
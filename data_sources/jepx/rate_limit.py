@@ -0,0 +1,51 @@
+"""
+JEPX へのリクエスト間隔の調整。
+
+標準ライブラリのみに依存するため、DuckDB や pyarrow を入れていない環境の
+スクリプトからも読み込める。
+"""
+import random
+import threading
+import time
+from typing import Optional
+
+
+class AdaptiveDelay:
+    """
+    サーバーの応答に合わせて調整するリクエスト間隔（秒）。
+
+    429 や 5xx、接続エラーでは間隔を倍にし（Retry-After があればそれ以上にする）、
+    成功が続くと少しずつ縮める。複数スレッドから共有できる。
+    """
+
+    def __init__(self, initial: float = 0.5, minimum: float = 0.2, maximum: float = 30.0):
+        self.minimum = minimum
+        self.maximum = maximum
+        self._value = initial
+        self._lock = threading.Lock()
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+    def on_success(self) -> None:
+        with self._lock:
+            self._value = max(self._value * 0.9, self.minimum)
+
+    def on_throttled(self, retry_after: Optional[str] = None) -> None:
+        with self._lock:
+            value = self._value * 2
+            if retry_after and retry_after.isdigit():
+                value = max(value, float(retry_after))
+            self._value = min(value, self.maximum)
+
+    def update(self, status_code: int, retry_after: Optional[str] = None) -> None:
+        """HTTPステータスに応じて間隔を調整する（それ以外の 4xx では変えない）"""
+        if status_code == 200:
+            self.on_success()
+        elif status_code == 429 or status_code >= 500:
+            self.on_throttled(retry_after)
+
+    def sleep(self, jitter: float = 0.5) -> None:
+        """現在の間隔に ±jitter の割合の揺らぎを加えて待つ"""
+        time.sleep(self._value * random.uniform(1 - jitter, 1 + jitter))
@@ -23,7 +23,7 @@ if str(project_root) not in sys.path:
 
 # Import DuckDBConnection
 try:
-    from db.duckdb_connection import DuckDBConnection
+    from db.duckdb_connection import DuckDBConnection, read_schema_definition
 except ImportError as e:
     print(f"Error importing DuckDBConnection: {e}", file=sys.stderr)
     print("Please ensure db/duckdb_connection.py exists and the project structure is correct.", file=sys.stderr)
@@ -64,8 +64,7 @@ class JMAWeatherDBImporter:
             if not schema_path.exists():
                 raise FileNotFoundError(f"Schema file not found: {schema_path}")
 
-            with open(schema_path, "r", encoding='utf-8') as f:
-                full_schema_sql = f.read()
+            full_schema_sql = read_schema_definition(schema_path)
 
             # Extract the specific CREATE TABLE statement for jma_weather
             # Regex tries to capture the entire statement until the semicolon
@@ -12,7 +12,7 @@ import pandas as pd
 from datetime import date, datetime
 from typing import List, Tuple, Optional, Dict, Any, Union
 from pathlib import Path
-from db.duckdb_connection import DuckDBConnection
+from db.duckdb_connection import DuckDBConnection, read_schema_definition
 import time
 import duckdb
 
@@ -65,8 +65,7 @@ class OCCTO30MinDBImporter:
                 # Raise error if schema file is missing
                 raise FileNotFoundError(f"Schema definition file not found at: {schema_path}")
 
-            with open(schema_path, 'r') as f:
-                schema_sql = f.read()
+            schema_sql = read_schema_definition(schema_path)
 
             if not schema_sql.strip():
                  logger.error("Schema definition file is empty.")
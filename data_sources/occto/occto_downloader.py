@@ -181,12 +181,14 @@ class OCCTODownloader:
             print("-"*80)
             
             # Display the first few rows
-            pd.set_option('display.max_columns', None)  # Show all columns
-            pd.set_option('display.width', 1000)  # Set display width
-            pd.set_option('display.max_colwidth', 30)  # Limit column width
-            
+            # 表示設定はこのブロック内だけに適用し、pandas のグローバル設定を書き換えない
             if rows_to_display > 0:
-                print(df.head(rows_to_display).to_string())
+                with pd.option_context(
+                    'display.max_columns', None,  # Show all columns
+                    'display.width', 1000,  # Set display width
+                    'display.max_colwidth', 30,  # Limit column width
+                ):
+                    print(df.head(rows_to_display).to_string())
             
             # Count plant types if available
             plant_type_col = None
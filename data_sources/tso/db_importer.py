@@ -10,6 +10,7 @@ import os
 import sys
 import argparse
 import logging
+import numpy as np
 import pandas as pd
 from pathlib import Path
 from datetime import date, datetime, timedelta
@@ -23,7 +24,7 @@ project_root = os.path.dirname(os.path.dirname(current_dir))
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
-from db.duckdb_connection import DuckDBConnection
+from db.duckdb_connection import DuckDBConnection, read_schema_definition
 from data_sources.tso.unified_downloader import UnifiedTSODownloader
 # from data_sources.tso.tso_urls import TSO_INFO  # 削除されたためコメントアウト
 
@@ -46,13 +47,24 @@ class TSODataImporter:
     with文で使用することで、ブロックを抜けた時に自動的にデータベース接続を閉じます。
     """
     
-    def __init__(self, db_path: str = None, read_only: bool = False):
+    def __init__(
+        self,
+        db_path: str = None,
+        read_only: bool = False,
+        db_connection: Optional[DuckDBConnection] = None
+    ):
         """
         TSOデータインポーターの初期化
+
+        Args:
+            db_path: データベースファイルのパス（db_connection 指定時は無視）
+            read_only: 読み取り専用モードで接続する場合はTrue（db_connection 指定時は無視）
+            db_connection: 共有するDB接続。指定した場合は終了時に閉じない
         """
         try:
-            # データベース接続の初期化
-            self.connection = DuckDBConnection(db_path, read_only)
+            # データベース接続の初期化 (なければ作成)。自分で作成した接続だけを終了時に閉じる
+            self._owns_connection = db_connection is None
+            self.connection = db_connection or DuckDBConnection(db_path, read_only)
             
             # エリア別テーブル名の定義
             self.area_tables = {
@@ -114,8 +126,7 @@ class TSODataImporter:
                 raise FileNotFoundError(error_msg)
                 
             # スキーマ定義ファイルから全てのSQL文を分割して実行
-            with open(schema_path, "r") as f:
-                schema_sql = f.read()
+            schema_sql = read_schema_definition(schema_path)
             
             if not schema_sql.strip():
                 error_msg = "スキーマ定義ファイルが空です"
@@ -213,6 +224,8 @@ class TSODataImporter:
         需要データをデータベースにインポート
         """
         total_inserted = 0
+        # 保存先テーブルごとに整形済みのデータフレームを集め、最後にまとめて1回で挿入する
+        frames_by_table: Dict[str, List[pd.DataFrame]] = {}
         
         try:
             # 各データフレームを処理
@@ -385,29 +398,38 @@ class TSODataImporter:
                 
                 # エリア別テーブルの存在確認
                 try:
-                    table_check = self.connection.execute_query(f"SELECT COUNT(*) FROM {area_table_name} LIMIT 1")
-                    print(f"[INFO] テーブル '{area_table_name}' が存在することを確認しました")
+                    table_exists = self.connection.table_exists(area_table_name)
                 except Exception as e:
                     print(f"[ERROR] テーブル '{area_table_name}' が存在しないか、アクセスできません: {str(e)}")
                     continue
+                if not table_exists:
+                    print(f"[ERROR] テーブル '{area_table_name}' が存在しないか、アクセスできません")
+                    continue
+                print(f"[INFO] テーブル '{area_table_name}' が存在することを確認しました")
                 
                 # 統合テーブルとエリア別テーブル両方に保存する必要はない
                 # エリア別テーブルにのみ保存する
-                try:
+                if len(df) > 0:
+                    frames_by_table.setdefault(area_table_name, []).append(df)
+                else:
+                    logger.warning(f"データフレームが空です (rows={len(df)})")
+                    print(f"[WARNING] データフレームが空です (rows={len(df)})")
+            
+            # 全エリアの挿入を1トランザクションにまとめ、途中で失敗した場合は全体を取り消す
+            with self.connection.transaction():
+                for area_table_name, frames in frames_by_table.items():
                     # データを挿入
-                    rows = len(df)
-                    if rows > 0:
-                        inserted = self.connection.save_dataframe(df, area_table_name)
-                        total_inserted += inserted
-                        logger.info(f"{area_table_name}テーブルに{inserted}行を挿入しました")
-                        print(f"[INFO] {area_table_name}テーブルに{inserted}行を挿入しました")
-                    else:
-                        logger.warning(f"データフレームが空です (rows={rows})")
-                        print(f"[WARNING] データフレームが空です (rows={rows})")
-                except Exception as e:
-                    logger.error(f"データ挿入中にエラーが発生しました: {str(e)}")
-                    print(f"[ERROR] データ挿入中にエラーが発生しました: {str(e)}")
-                continue
+                    df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True, copy=False)
+                    # 日付・コマ順に並べてから挿入し、行グループの min/max (ゾーンマップ) を狭く保つ。
+                    # date は文字列と日時型が混在しうるため、文字列として比較する
+                    df = df.sort_values(
+                        ['date', 'slot'], kind='stable', ignore_index=True,
+                        key=lambda col: col.astype(str) if col.name == 'date' else col,
+                    )
+                    inserted = self.import_df(df, area_table_name)
+                    total_inserted += inserted
+                    logger.info(f"{area_table_name}テーブルに{inserted}行を挿入しました")
+                    print(f"[INFO] {area_table_name}テーブルに{inserted}行を挿入しました")
             
         except Exception as e:
             logger.error(f"データインポート処理中にエラーが発生しました: {str(e)}")
@@ -416,12 +438,29 @@ class TSODataImporter:
         
         return total_inserted
     
+    def import_df(self, df: pd.DataFrame, table_name: str) -> int:
+        """
+        整形済みのデータフレームを1回の一括挿入でテーブルに保存します。
+
+        DataFrame を一時ビューとして登録し INSERT ... SELECT で挿入するため、
+        行ごとの INSERT を発行しません。既存の master_key を持つ行はスキップされます。
+
+        Args:
+            df: 保存するデータフレーム（master_key 列が必要）
+            table_name: 保存先テーブル名
+
+        Returns:
+            挿入された行数
+        """
+        return self.connection.save_dataframe(df, table_name)
+
     def import_from_downloader(
         self, 
         tso_ids: List[str] = None, 
         start_date: date = None, 
         end_date: date = None,
-        url_type: str = "demand"
+        url_type: str = "demand",
+        dates: Optional[np.ndarray] = None
     ) -> int:
         """
         UnifiedTSODownloaderを使用して、指定されたTSO IDのデータをダウンロードし、インポートします。
@@ -431,6 +470,8 @@ class TSODataImporter:
             start_date: データの開始日。指定されていない場合は、現在の月の最初の日を使用します。
             end_date: データの終了日。指定されていない場合は、現在の日付を使用します。
             url_type: ダウンロードするデータの種類（'demand'または'supply'）
+            dates: 対象日の配列（例: pd.date_range(start_date, end_date).date）。
+                指定した場合は start_date/end_date より優先し、配列の最小・最大日を期間とします。
             
         Returns:
             インポートされた行数
@@ -449,10 +490,18 @@ class TSODataImporter:
             
             if not end_date:
                 end_date = date.today()
+
+        if dates is not None:
+            if len(dates) == 0:
+                logger.warning("対象日が指定されていません")
+                return 0
+            # 日付ごとのループを組まず、配列から期間をまとめて求める
+            start_date, end_date = dates.min(), dates.max()
             
         logger.info(f"{start_date} から {end_date} までの {', '.join(tso_ids)} データをダウンロード中")
         
         total_inserted = 0
+        downloaded = []
         
         # 各TSO IDに対してダウンロードを実行
         try:
@@ -460,21 +509,17 @@ class TSODataImporter:
                 try:
                     # この特定のTSO ID用にダウンローダーを初期化
                     # データベース接続は共有する
-                    downloader = UnifiedTSODownloader(
+                    with UnifiedTSODownloader(
                         tso_id=tso_id,
                         db_connection=self.connection,  # db → connection に変更
                         url_type=url_type
-                    )
+                    ) as downloader:
+                        # データのダウンロード (保存は import_data でまとめて行う)
+                        data = downloader.download_files(start_date, end_date, save_to_db=False)
                     
-                    # データのダウンロード
-                    data = downloader.download_files(start_date, end_date)
-                    
-                    # ダウンロードしたデータをインポート
                     if data is not None and len(data) > 0:
-                        # 結果をインポート
-                        inserted = self.import_data([(d, tid, df) for d, tid, df in data]) # 変数名変更 d, tid
-                        total_inserted += inserted
-                        logger.info(f"TSO {tso_id} から {inserted} 行をインポートしました")
+                        downloaded.extend(data)
+                        logger.info(f"TSO {tso_id} から {len(data)} 件のデータを取得しました")
                     else:
                         logger.warning(f"TSO {tso_id} からデータを取得できませんでした")
                 
@@ -482,6 +527,11 @@ class TSODataImporter:
                     logger.error(f"TSO {tso_id} の処理中にエラー: {str(e)}")
                     # TSOごとのエラーはログに残し、次のTSOへ進む
                     continue
+            
+            # ダウンロードしたデータをテーブルごとに一括インポート
+            if downloaded:
+                total_inserted = self.import_data(downloaded)
+                logger.info(f"{total_inserted} 行をインポートしました")
         finally:
             # この finally は for ループの外側の try に対応するべき
             logger.info(f"TSOデータインポート処理メソッド import_from_downloader 完了 (tso_ids: {tso_ids})")
@@ -495,9 +545,9 @@ class TSODataImporter:
     
     def __exit__(self, exc_type, exc_val, exc_tb):
         """コンテキストマネージャの終了処理"""
-        # 明示的にDB接続をクローズ
+        # 自分で作成したDB接続のみ明示的にクローズ
         try:
-            if hasattr(self, 'connection') and self.connection is not None:
+            if getattr(self, '_owns_connection', False) and self.connection is not None:
                 self.connection.close()
         except Exception as e:
             print(f"[WARN] TSODataImporterのコンテキスト終了時のDB接続クローズでエラー: {e}")
@@ -510,10 +560,10 @@ def parse_args():
     parser.add_argument('--tso-id', dest='tso_ids', action='append',
                         help='インポートするTSO ID（複数回指定可能、省略時は全TSO）')
     
-    parser.add_argument('--start-date', dest='start_date', type=lambda s: datetime.strptime(s, '%Y-%m-%d').date(),
+    parser.add_argument('--start-date', dest='start_date', type=date.fromisoformat,
                         help='ダウンロード開始日（YYYY-MM-DD形式、省略時は今日）')
     
-    parser.add_argument('--end-date', dest='end_date', type=lambda s: datetime.strptime(s, '%Y-%m-%d').date(),
+    parser.add_argument('--end-date', dest='end_date', type=date.fromisoformat,
                         help='ダウンロード終了日（YYYY-MM-DD形式、省略時は開始日と同じ）')
     
     parser.add_argument('--db-path', dest='db_path',
@@ -538,10 +588,11 @@ def main():
         with TSODataImporter(db_path=args.db_path) as importer:
             
             # データをダウンロードしてインポート
+            start_date = args.start_date or date.today()
+            end_date = args.end_date or start_date
             imported_rows = importer.import_from_downloader(
                 tso_ids=args.tso_ids,
-                start_date=args.start_date,
-                end_date=args.end_date
+                dates=pd.date_range(start_date, end_date, freq='D').date
             )
             
             logger.info(f"合計 {imported_rows} 行のデータをインポートしました")
@@ -1,4 +1,6 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import logging
 import re
 from datetime import date, datetime
@@ -19,6 +21,27 @@ class TSODataDownloader:
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
+        # セッションを使い回し、同じホストへの TCP/TLS 接続を keep-alive で再利用する。
+        # 一時的なサーバーエラーは指数バックオフで最大3回まで再試行する。
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(
+            pool_connections=10,  # TSOのホスト数
+            pool_maxsize=8,
+            max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=(500, 502, 503, 504)),
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def close(self) -> None:
+        """HTTPセッションを閉じる"""
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
 
     def download_content(self, url: str, **kwargs) -> bytes:
         """
@@ -35,7 +58,7 @@ class TSODataDownloader:
         try:
             params = kwargs.get('params', {})
             logger.info(f"{url} からコンテンツをダウンロード中 (Params: {params})")
-            response = requests.get(url, headers=self.headers, params=params, verify=False, timeout=60)
+            response = self.session.get(url, params=params, verify=False, timeout=(10, 60))
             response.raise_for_status()
 
             if len(response.content) == 0:
@@ -1,5 +1,9 @@
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
 import logging
+import csv
 import io
 import zipfile
 import re
@@ -116,7 +120,11 @@ class TSODataParser:
                 # ★ 全てのTSOでヘッダーが2行目(index=1)にあると仮定して読み込む
                 # ★ skipinitialspace=True も追加
                 logger.info("CSV読み込み試行 (header=1, skipinitialspace=True)")
-                df = pd.read_csv(io.StringIO(csv_text), header=1, skipinitialspace=True)
+                table = self._read_csv_arrow(csv_text)
+                if table is not None:
+                    df = table.to_pandas()
+                else:
+                    df = pd.read_csv(io.StringIO(csv_text), header=1, skipinitialspace=True)
 
             except pd.errors.ParserError as e:
                  logger.warning(f"Pandas ParserError (header=1): {e}. ヘッダーなしで再試行します。")
@@ -156,6 +164,45 @@ class TSODataParser:
             logger.error(f"CSV処理中に予期せぬエラー: {e}", exc_info=True)
             return pd.DataFrame()
 
+    def _read_csv_arrow(self, csv_text: str) -> Optional[pa.Table]:
+        """
+        CSV を pyarrow の C++ リーダーで読み込む (2行目をヘッダーとして扱う)。
+
+        pandas の read_csv(header=1, skipinitialspace=True) と同じ結果になるよう、
+        列名と文字列セルの前後の空白を除去する。全列を文字列として読み込み、
+        TIME ("00:30") や DATE が time32/date32 に推論されて後段の変換が崩れるのを防ぐ。
+        列名が空・重複している場合や列数が揃わない行がある場合は None を返し、
+        呼び出し側で pandas にフォールバックする。
+        """
+        rows = csv.reader(io.StringIO(csv_text))
+        next(rows, None)
+        header = next(rows, None)
+        if not header:
+            return None
+        names = [name.strip() for name in header]
+        if '' in names or len(set(names)) != len(names):
+            return None
+
+        try:
+            table = pa_csv.read_csv(
+                io.BytesIO(csv_text.encode('utf-8')),
+                read_options=pa_csv.ReadOptions(skip_rows=1),
+                convert_options=pa_csv.ConvertOptions(
+                    column_types={name: pa.string() for name in header},
+                    strings_can_be_null=True,
+                ),
+            )
+        except pa.ArrowInvalid as e:
+            logger.debug(f"pyarrow での CSV 読み込みに失敗したため pandas で再試行します: {e}")
+            return None
+
+        # csv.reader と pyarrow でヘッダーの解釈が異なる場合は pandas に任せる
+        if table.column_names != header:
+            return None
+
+        columns = [pc.utf8_trim_whitespace(column) for column in table.columns]
+        return pa.Table.from_arrays(columns, names=names)
+
     def _detect_encoding(self, binary_content: bytes) -> str:
         """
         バイナリデータのエンコーディングを検出する。
@@ -231,7 +278,11 @@ class TSODataParser:
 
                             # ★ header=1 を指定して2行目をヘッダーとして読み込む
                             # ★ skipinitialspace=True を追加して区切り文字後のスペースを無視
-                            df_raw = pd.read_csv(io.StringIO(csv_text), header=1, skipinitialspace=True)
+                            table = self._read_csv_arrow(csv_text)
+                            if table is not None:
+                                df_raw = table.to_pandas()
+                            else:
+                                df_raw = pd.read_csv(io.StringIO(csv_text), header=1, skipinitialspace=True)
                             if df_raw.empty:
                                 logger.warning(f"CSV読み込み後データが空: {csv_file_name}")
                                 continue
@@ -379,7 +430,8 @@ class TSODataParser:
                          time_parts = time_str.split(':')
                          time_str = f"{time_parts[0]}:{time_parts[1]}"
                  
-                 hour, minute = map(int, str(time_str).split(':'))
+                 # HH:MM:SS 形式の秒は切り捨てる
+                 hour, minute = map(int, str(time_str).split(':')[:2])
                  slot = hour * 2 + (1 if minute == 0 else 2) # 00:00 -> 1, 00:30 -> 2
                  return 48 if slot == 0 and hour == 24 else slot # 24:00 -> 48 考慮
              except Exception as e:
@@ -540,7 +592,8 @@ class TSODataParser:
                          time_parts = time_str.split(':')
                          time_str = f"{time_parts[0]}:{time_parts[1]}"
                  
-                 hour, minute = map(int, str(time_str).split(':'))
+                 # HH:MM:SS 形式の秒は切り捨てる
+                 hour, minute = map(int, str(time_str).split(':')[:2])
                  slot = hour * 2 + (1 if minute == 0 else 2) # 00:00 -> 1, 00:30 -> 2
                  return 48 if slot == 0 and hour == 24 else slot # 24:00 -> 48 考慮
              except Exception as e:
@@ -66,7 +66,8 @@ class UnifiedTSODownloader:
             url_type: データ種類 ('demand' or 'supply')
             table_name: 保存先テーブル名 (オプション)
         """
-        # DB接続の初期化 (なければ作成)
+        # DB接続の初期化 (なければ作成)。自分で作成した接続だけを close() で閉じる
+        self._owns_db_connection = db_connection is None
         self.db_connection = db_connection or DuckDBConnection()
         self.url_type = url_type
         self.table_name_prefix = table_name # 特定のテーブル名を指定する場合
@@ -94,6 +95,18 @@ class UnifiedTSODownloader:
         self.parser = TSODataParser(db_connection=self.db_connection)
 
         logger.info(f"UnifiedTSODownloader初期化完了: TSOs=[{', '.join(self.tso_ids)}], URL Type={url_type}")
+
+    def close(self) -> None:
+        """HTTPセッションと、このインスタンスが作成したDB接続を閉じる"""
+        self.downloader.close()
+        if self._owns_db_connection:
+            self.db_connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
     
     def download_files(
         self,
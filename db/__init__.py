@@ -3,6 +3,6 @@ Database package for Power Market Data project.
 This package contains database connection and schema management components.
 """
 
-from .duckdb_connection import DuckDBConnection
+from .duckdb_connection import DuckDBConnection, close_pooled_connections, read_schema_definition
 
-__all__ = ['DuckDBConnection']
+__all__ = ['DuckDBConnection', 'close_pooled_connections', 'read_schema_definition']
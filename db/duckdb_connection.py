@@ -1,26 +1,283 @@
 # db/duckdb_connection.py
 import os
 import atexit
+import functools
+import math
+import threading
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional, Tuple, Union, Dict, Any
+from typing import Optional, Tuple, Union, Dict, Any, Callable, Iterator
 
 import duckdb
 import pandas as pd
 import numpy as np
+import pyarrow as pa
 import tempfile
-import time
 import logging
 
 from dotenv import load_dotenv
 
 logger = logging.getLogger(__name__)
 
+# .env はインポート時に1回だけ読み込む (インスタンス生成ごとに再読込しない)
+load_dotenv()
+
+# この行数以上の DataFrame は Arrow に変換してから DuckDB に渡す
+# (変換コストを償却でき、数値列はゼロコピーでスキャンされる)
+ARROW_CONVERSION_MIN_ROWS = 10_000
+
+# save_dataframe が1回の INSERT で扱う最大行数 (DuckDB の行グループサイズ 122,880 行に合わせる)
+DEFAULT_CHUNK_ROWS = 122_880
+
+
+# 列名タプル -> SQL 用の引用済み列リスト ("a", "b", ...)。インスタンスをまたいで共有する
+_COLS_CACHE: Dict[Tuple[str, ...], str] = {}
+
+
+def _quoted_column_list(columns: Tuple[str, ...]) -> str:
+    cols_sql = _COLS_CACHE.get(columns)
+    if cols_sql is None:
+        cols_sql = _COLS_CACHE[columns] = ", ".join(f'"{col}"' for col in columns)
+    return cols_sql
+
+
+def _to_scan_source(df: pd.DataFrame) -> Union[pd.DataFrame, pa.Table]:
+    """DuckDB に登録するオブジェクトを返す。大きな DataFrame は pyarrow.Table に変換する。"""
+    if len(df) < ARROW_CONVERSION_MIN_ROWS:
+        return df
+    if all(isinstance(dtype, pd.ArrowDtype) for dtype in df.dtypes):
+        # 既に Arrow バックエンドの列のみであれば DuckDB がそのまま Arrow としてスキャンする
+        return df
+    return pa.Table.from_pandas(df, preserve_index=False, safe=False)
+
+
+SCHEMA_DEFINITION_PATH = Path(__file__).resolve().parent / "schema_definition.sql"
+
+
+@functools.lru_cache(maxsize=None)
+def read_schema_definition(schema_path: Union[str, Path] = SCHEMA_DEFINITION_PATH) -> str:
+    """
+    スキーマ定義ファイルを読み込んで返す。
+
+    各インポーターの初期化のたびにディスクから読み直さないよう、パスごとに内容をキャッシュする。
+    ファイルが存在しない場合は FileNotFoundError を送出する。
+    """
+    with open(schema_path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+_FALLBACK_DB_PATH = "/default/path/should/not/be/used/if/dotenv/works/power_market_data.duckdb"
+
+# 親ディレクトリの存在を確認済みのDBパス。abspath/stat/makedirs をパスごとに1回に抑える
+_ENSURED_DIRS: set = set()
+
+
+@functools.lru_cache(maxsize=1)
+def _default_db_path() -> str:
+    """環境変数 DB_PATH を1回だけ解決して返す。"""
+    db_path = os.getenv("DB_PATH", _FALLBACK_DB_PATH)
+    logger.info(f"DB path not provided directly. Resolved path: {db_path}")
+    if db_path == _FALLBACK_DB_PATH:
+        logger.warning("Using hardcoded fallback DB_PATH. Ensure .env file is configured correctly or DB_PATH environment variable is set.")
+    return db_path
+
+
+def _ensure_db_dir(db_path: str) -> None:
+    """DBファイルの親ディレクトリを作成する。パスごとに1回だけ実行する。"""
+    if db_path in _ENSURED_DIRS:
+        return
+    db_dir = os.path.dirname(os.path.abspath(db_path))
+    if db_dir and not os.path.exists(db_dir):
+        try:
+            os.makedirs(db_dir, exist_ok=True)
+            logger.info(f"Ensured directory exists: {db_dir}")
+        except OSError as e:
+            logger.error(f"Could not create directory {db_dir}: {e}", exc_info=True)
+            return
+    elif not db_dir:
+         logger.info(f"Database path is in the current directory or is a special path (e.g., :memory:). Path: {db_path}")
+    _ENSURED_DIRS.add(db_path)
+
+
+# master_key の一意索引を確認済みの (db_path, table_name)
+_MASTER_KEY_INDEXED: set = set()
+
+
+# ---------------------------------------------------------------------- #
+# Resource limits
+# ---------------------------------------------------------------------- #
+# コンテナ内では DuckDB の既定値 (全コア・物理メモリの80%) がホストの値を
+# 参照してしまうため、cgroup とアフィニティから実際に使える量を求めて渡す。
+_CGROUP_MEMORY_LIMIT_FILES = (
+    "/sys/fs/cgroup/memory.max",                    # cgroup v2
+    "/sys/fs/cgroup/memory/memory.limit_in_bytes",  # cgroup v1
+)
+_CGROUP_CPU_MAX_FILE = "/sys/fs/cgroup/cpu.max"
+
+
+def _read_first_line(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.readline().strip()
+    except OSError:
+        return None
+
+
+def _available_cpus() -> int:
+    """アフィニティと cgroup の CPU クォータから利用可能なコア数を求める。"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # macOS / Windows
+        cpus = os.cpu_count() or 1
+
+    cpu_max = _read_first_line(_CGROUP_CPU_MAX_FILE)
+    if cpu_max:
+        quota, _, period = cpu_max.partition(" ")
+        if quota.isdigit() and period.isdigit() and int(period) > 0:
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    return max(1, cpus)
+
+
+def _memory_budget_bytes() -> Optional[int]:
+    """空きメモリと cgroup の上限のうち小さい方の半分を DuckDB の上限とする。"""
+    candidates = []
+    try:
+        candidates.append(os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE'))
+    except (AttributeError, ValueError, OSError):
+        pass
+    for path in _CGROUP_MEMORY_LIMIT_FILES:
+        value = _read_first_line(path)
+        # 上限なしの場合は "max" (v2) または非常に大きな値 (v1) になる
+        if value and value.isdigit() and int(value) < 1 << 60:
+            candidates.append(int(value))
+            break
+    if not candidates:
+        return None
+    return min(candidates) // 2
+
+
+@functools.lru_cache(maxsize=1)
+def _default_connect_config() -> Dict[str, str]:
+    """
+    接続時の既定設定。呼び出し側が config で指定した項目はそちらが優先される。
+
+    取り込みでは行の挿入順を保持する必要がないため preserve_insertion_order は無効にする
+    (順序が必要なクエリは ORDER BY を付けること)。
+    DUCKDB_TEMP_DIRECTORY 環境変数が設定されていれば、スピル先をそのディレクトリにする。
+    """
+    config = {
+        "threads": str(_available_cpus()),
+        "preserve_insertion_order": "false",
+    }
+    memory_limit = _memory_budget_bytes()
+    if memory_limit:
+        config["memory_limit"] = f"{memory_limit}B"
+    temp_directory = os.getenv("DUCKDB_TEMP_DIRECTORY")
+    if temp_directory:
+        config["temp_directory"] = temp_directory
+    return config
+
+
+# ---------------------------------------------------------------------- #
+# Connection pool
+# ---------------------------------------------------------------------- #
+# DBファイルごとに親接続を1つだけ開いて使い回す。
+# 各 DuckDBConnection は親接続の cursor() を取得して使うため、同時に開いている間は
+# カタログの読み込みやファイルのオープンが1回で済む。親接続は参照数で管理し、
+# 最後のインスタンスが close した時点で閉じてファイルロックを解放する。
+class _PooledConnection:
+    __slots__ = ("connection", "read_only", "config", "refs")
+
+    def __init__(self, connection: duckdb.DuckDBPyConnection, read_only: bool, config: frozenset) -> None:
+        self.connection = connection
+        self.read_only = read_only
+        self.config = config
+        self.refs = 0
+
+
+_POOL: Dict[str, _PooledConnection] = {}
+_POOL_LOCK = threading.Lock()
+
+
+def _acquire_pooled_connection(
+    db_path: str, read_only: bool, config: Dict[str, Any]
+) -> duckdb.DuckDBPyConnection:
+    """
+    プールから親接続を取得して参照数を増やす。なければ開いてプールに登録する。
+
+    read_only の要求は書き込み可能な親接続でも満たせるため、そのまま共有する。
+    親接続と互換性のない要求 (読み取り専用の親への書き込み要求や、異なる config) は、
+    他に使用中のインスタンスがなければ親接続を開き直し、使用中なら ConnectionException を送出する。
+    """
+    config_key = frozenset((k, str(v)) for k, v in config.items())
+    with _POOL_LOCK:
+        entry = _POOL.get(db_path)
+        if entry is not None and (
+            (entry.read_only and not read_only) or (config_key and entry.config != config_key)
+        ):
+            if entry.refs:
+                raise duckdb.ConnectionException(
+                    f"{db_path} is already open in this process with a different configuration "
+                    f"(read_only={entry.read_only}, config={dict(entry.config)}); "
+                    f"close the other connections first."
+                )
+            _close_entry(db_path, entry)
+            entry = None
+        if entry is None:
+            connect_config = {**_default_connect_config(), **config}
+            connection = duckdb.connect(database=db_path, read_only=read_only, config=connect_config)
+            entry = _POOL[db_path] = _PooledConnection(connection, read_only, config_key)
+            logger.info(f"Opened pooled DuckDB connection: {db_path} (read_only={read_only}, config={connect_config})")
+        entry.refs += 1
+        return entry.connection
+
+
+def _release_pooled_connection(db_path: str, connection: duckdb.DuckDBPyConnection) -> None:
+    """参照数を減らし、0 になったら親接続を閉じる。"""
+    with _POOL_LOCK:
+        entry = _POOL.get(db_path)
+        # close_pooled_connections() 後や開き直し後の古い親接続は対象外
+        if entry is None or entry.connection is not connection:
+            return
+        entry.refs -= 1
+        if entry.refs <= 0:
+            _close_entry(db_path, entry)
+
+
+def _close_entry(db_path: str, entry: _PooledConnection) -> None:
+    _POOL.pop(db_path, None)
+    try:
+        entry.connection.close()
+        logger.info(f"Closed pooled DuckDB connection: {db_path}")
+    except Exception as e:
+        logger.warning(f"Failed to close pooled DuckDB connection ({db_path}): {e}", exc_info=True)
+
+
+def close_pooled_connections() -> None:
+    """
+    プール内の親接続をすべて閉じ、DuckDB のファイルロックを解放する。
+
+    プロセス終了時に自動で呼ばれる。close されていないインスタンスが残っていても
+    別プロセスから同じDBファイルを開けるようにしたい場合に呼び出す。
+    """
+    with _POOL_LOCK:
+        for db_path, entry in list(_POOL.items()):
+            _close_entry(db_path, entry)
+
+
+atexit.register(close_pooled_connections)
+
+
 class DuckDBConnection:
     """
     Context‑manager friendly wrapper around duckdb.connect.
 
     * 既定では書き込み可能な接続を取得します。
-    * with 文で囲むと確実に close され、DuckDB のロックが残りません。
+    * 接続はプロセス内でプールされ、各インスタンスはその cursor を使います。
+      with 文を抜けると cursor が close されます。
+    * DuckDB のファイルロックは、同じDBファイルを開いている最後のインスタンスが
+      close した時点（またはプロセス終了時、`close_pooled_connections()` の呼び出し時）
+      に解放されます。
     * read‑only 接続を取りたい場合は `read_only=True` を渡してください。
     """
 
@@ -30,52 +287,34 @@ class DuckDBConnection:
         read_only: bool = False,
         config: Optional[Dict[str, Any]] = None,
     ) -> None:
-        load_dotenv()
-
         if db_path is None:
-            self.db_path = os.getenv(
-                "DB_PATH",
-                "/default/path/should/not/be/used/if/dotenv/works/power_market_data.duckdb"
-            )
-            logger.info(f"DB path not provided directly. Resolved path: {self.db_path}")
-            if self.db_path == "/default/path/should/not/be/used/if/dotenv/works/power_market_data.duckdb":
-                logger.warning("Using hardcoded fallback DB_PATH. Ensure .env file is configured correctly or DB_PATH environment variable is set.")
+            self.db_path = _default_db_path()
         else:
             self.db_path = str(db_path)
-            logger.info(f"DB path provided directly: {self.db_path}")
+            logger.debug("DB path provided directly: %s", self.db_path)
 
-        db_dir = os.path.dirname(os.path.abspath(self.db_path))
-        if db_dir and not os.path.exists(db_dir):
-            try:
-                os.makedirs(db_dir, exist_ok=True)
-                logger.info(f"Ensured directory exists: {db_dir}")
-            except OSError as e:
-                logger.error(f"Could not create directory {db_dir}: {e}", exc_info=True)
-        elif not db_dir:
-             logger.info(f"Database path is in the current directory or is a special path (e.g., :memory:). Path: {self.db_path}")
+        _ensure_db_dir(self.db_path)
 
         self.read_only = read_only
         self.config = config or {}
         self._connection: Optional[duckdb.DuckDBPyConnection] = None
-
-        atexit.register(self.close)
+        # cursor の取得元のプールの親接続 (close 時に参照数を戻す)
+        self._parent: Optional[duckdb.DuckDBPyConnection] = None
+        # 接続後は cursor の execute を束縛して保持し、execute_query の接続確認を省く
+        self._execute: Optional[Callable[..., duckdb.DuckDBPyConnection]] = None
+        # main スキーマに存在するテーブル名のキャッシュ (初回参照時に取得)
+        self._known_tables: Optional[set] = None
+        # (table_name, 列名タプル) ごとに組み立て済みの INSERT 文
+        self._insert_sql: Dict[Tuple[str, Tuple[str, ...]], str] = {}
+        # transaction() の内側かどうか (内側では execute_query の自動コミットを行わない)
+        self._in_transaction = False
 
     # ------------------------------------------------------------------ #
     # Context‑manager support
     # ------------------------------------------------------------------ #
     def __enter__(self) -> "DuckDBConnection":
         if self._connection is None:
-            logger.info(f"Attempting to connect to DuckDB: {self.db_path} (read_only={self.read_only}, config={self.config})")
-            try:
-                self._connection = duckdb.connect(
-                    database=self.db_path,
-                    read_only=self.read_only,
-                    config=self.config
-                )
-                logger.info(f"Successfully opened DuckDB connection: {self.db_path}")
-            except Exception as e:
-                logger.error(f"Failed to open DuckDB connection to {self.db_path}: {e}", exc_info=True)
-                raise
+            self._open()
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb) -> None:
@@ -90,44 +329,108 @@ class DuckDBConnection:
         params: Optional[Tuple] = None,
         commit: bool = True,
     ) -> duckdb.DuckDBPyRelation:
-        self._ensure_connection()
+        execute = self._execute
+        if execute is None:
+            self._ensure_connection()
+            execute = self._execute
 
         try:
-            logger.debug(
-                f"Executing query on {'RO' if self.read_only else 'RW'} DB ({self.db_path}): {query[:120]}"
-                f"{' with params' if params else ''}"
-            )
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "Executing query on %s DB (%s): %.120s%s",
+                    'RO' if self.read_only else 'RW', self.db_path, query,
+                    ' with params' if params else '',
+                )
             if params is not None:
-                result = self._connection.execute(query, params)
+                result = execute(query, params)
             else:
-                result = self._connection.execute(query)
+                result = execute(query)
 
-            if commit and not self.read_only:
+            if commit and not self.read_only and not self._in_transaction:
                 self._connection.commit()
-                logger.debug(f"Committed transaction for query: {query[:50]}...")
+                logger.debug("Committed transaction for query: %.50s...", query)
             return result
         except Exception as e:
             logger.error(f"Error executing query: {query[:120]}... Error: {e}", exc_info=True)
             raise
 
+    def execute_arrow(self, query: str, params: Optional[Tuple] = None) -> pa.Table:
+        """
+        クエリ結果を pyarrow.Table として返す。
+
+        fetchall() のように行ごとの Python タプルを作らず列単位で受け取るため、
+        大きな結果セットの取得に向く (数値列はゼロコピー)。DataFrame が必要な場合は
+        execute_arrow(...).to_pandas() を使う。
+        """
+        return self.execute_query(query, params, commit=False).fetch_arrow_table()
+
     def close(self) -> None:
         if self._connection is not None:
             try:
                 self._connection.close()
-                logger.info(f"Closed DuckDB connection: {self.db_path}")
+                logger.debug("Closed DuckDB cursor: %s", self.db_path)
             except Exception as e:
                 logger.warning(f"Failed to close DuckDB connection ({self.db_path}): {e}", exc_info=True)
             finally:
                 self._connection = None
+                self._execute = None
+                self._known_tables = None
+                _release_pooled_connection(self.db_path, self._parent)
+                self._parent = None
     
     def is_connected(self) -> bool:
         return self._connection is not None
 
+    def table_exists(self, table_name: str) -> bool:
+        """
+        テーブルが main スキーマに存在するかをキャッシュ済みのカタログで判定する。
+
+        キャッシュにない名前は作成直後の可能性があるため、一度だけカタログを取り直す。
+        DROP/ALTER などを実行した場合は invalidate_catalog_cache() を呼ぶこと。
+        """
+        if self._known_tables is not None and table_name in self._known_tables:
+            return True
+        self._known_tables = self._load_table_names()
+        return table_name in self._known_tables
+
+    def invalidate_catalog_cache(self) -> None:
+        """テーブル存在キャッシュを破棄する（DDL 実行後に呼び出す）"""
+        self._known_tables = None
+
+    @contextmanager
+    def transaction(self) -> Iterator["DuckDBConnection"]:
+        """
+        ブロック内の書き込みを1つのトランザクションにまとめる。
+
+        正常終了でコミットし、例外時はロールバックして例外を再送出する。
+        ブロック内の save_dataframe や execute_query は個別にコミットしない。
+        入れ子で呼び出した場合は外側のトランザクションにそのまま参加する。
+        """
+        if self._in_transaction:
+            yield self
+            return
+
+        self._ensure_connection()
+        self._connection.begin()
+        self._in_transaction = True
+        try:
+            yield self
+            self._connection.commit()
+        except Exception:
+            try:
+                self._connection.rollback()
+                logger.info("Rolled back transaction due to error.")
+            except Exception as rb_e:
+                logger.error(f"Failed to rollback transaction: {rb_e}")
+            raise
+        finally:
+            self._in_transaction = False
+
     def register(self, view_name: str, df: pd.DataFrame):
         self._ensure_connection()
         try:
             self._connection.register(view_name, df)
-            logger.debug(f"Registered DataFrame as view: '{view_name}'")
+            logger.debug("Registered DataFrame as view: '%s'", view_name)
         except Exception as e:
             logger.error(f"Failed to register view '{view_name}': {e}", exc_info=True)
             raise
@@ -143,32 +446,51 @@ class DuckDBConnection:
     # ------------------------------------------------------------------ #
     # Internal helpers
     # ------------------------------------------------------------------ #
+    def _load_table_names(self) -> set:
+        self._ensure_connection()
+        rows = self._connection.execute(
+            "SELECT table_name FROM information_schema.tables WHERE table_schema = 'main'"
+        ).fetchall()
+        return {row[0] for row in rows}
+
     def _ensure_connection(self) -> None:
         if self._connection is None:
-            logger.info(f"Lazily opening DuckDB connection: {self.db_path} (read_only={self.read_only}, config={self.config})")
+            self._open()
+
+    def _open(self) -> None:
+        """プールの親接続から cursor を取得する (__enter__ と遅延接続の共通処理)。"""
+        try:
+            parent = _acquire_pooled_connection(self.db_path, self.read_only, self.config)
             try:
-                self._connection = duckdb.connect(
-                    database=self.db_path,
-                    read_only=self.read_only,
-                    config=self.config
-                )
-                logger.info(f"Successfully opened DuckDB connection (lazy): {self.db_path}")
-            except Exception as e:
-                logger.error(f"Failed to lazily open DuckDB connection to {self.db_path}: {e}", exc_info=True)
+                self._connection = parent.cursor()
+            except Exception:
+                _release_pooled_connection(self.db_path, parent)
                 raise
-            
+            self._parent = parent
+        except Exception as e:
+            logger.error(f"Failed to open DuckDB connection to {self.db_path}: {e}", exc_info=True)
+            raise
+        self._execute = self._connection.execute
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Opened DuckDB cursor: %s (read_only=%s, config=%s)", self.db_path, self.read_only, self.config)
+
     def save_dataframe(
         self, 
         df: pd.DataFrame, 
         table_name: str, 
         if_exists: str = 'append',
-        check_duplicate_master_key: bool = True
+        check_duplicate_master_key: bool = True,
+        chunk_rows: int = DEFAULT_CHUNK_ROWS,
+        verify_table: bool = False,
     ) -> int:
         inserted_rows = 0
         if if_exists != 'append':
             logger.error(f"save_dataframe currently only supports if_exists='append', but got '{if_exists}'")
             raise ValueError("save_dataframe currently only supports if_exists='append'")
 
+        if chunk_rows <= 0:
+            raise ValueError(f"chunk_rows must be a positive integer, but got {chunk_rows}")
+
         if df.empty:
             logger.warning(f"DataFrame to save to table '{table_name}' is empty. No rows inserted.")
             return 0
@@ -177,85 +499,150 @@ class DuckDBConnection:
             logger.error(f"Duplicate check enabled but 'master_key' column missing in DataFrame for table '{table_name}'.")
             raise ValueError(f"DataFrame for table '{table_name}' is missing 'master_key' column required for duplicate check.")
         
-        if check_duplicate_master_key and df['master_key'].isna().any():
-            null_count = df['master_key'].isna().sum()
+        # NULL の master_key は1回のマスク計算で判定し、該当行がある場合のみ抽出する。
+        # 後続処理は位置ベース (iloc) なので reset_index は不要。
+        null_mask = pd.isna(df['master_key'].array) if check_duplicate_master_key else None
+        if null_mask is not None and null_mask.any():
+            null_count = int(null_mask.sum())
             logger.warning(f"'master_key' column in DataFrame for table '{table_name}' has {null_count} NULL values. These rows will be excluded.")
-            df = df[df['master_key'].notna()].reset_index(drop=True)
+            df = df.loc[~null_mask]
             if df.empty:
                 logger.warning(f"DataFrame for table '{table_name}' became empty after removing rows with NULL 'master_key'. No rows inserted.")
                 return 0
 
-        temp_view_name = f"temp_view_{table_name}_{int(time.time() * 1000)}_{os.getpid()}"
-        
         quoted_table_name = f'"{table_name}"'
-        quoted_temp_view_name = f'"{temp_view_name}"'
-        
-        conflict_target_column = "master_key"
 
         try:
             self._ensure_connection()
-            
-            try:
-                result = self._connection.execute(
-                    f"SELECT table_name FROM information_schema.tables WHERE table_name = '{table_name}'"
-                ).fetchone()
-                if not result:
-                     logger.warning(f"Table '{table_name}' does not appear to exist in information_schema.tables. "
-                                    "It's assumed to be created by schema definitions elsewhere, or this check might be incomplete.")
-            except Exception as e:
-                logger.warning(f"Could not robustly verify existence of table '{table_name}' using information_schema: {e}")
-
-            self._connection.register(temp_view_name, df)
-            logger.info(f"Registered DataFrame ({len(df)} rows) as temporary view '{temp_view_name}' for table {quoted_table_name}.")
 
-            quoted_cols_list = [f'"{c}"' for c in df.columns]
-            cols_sql_fragment = ", ".join(quoted_cols_list)
+            # テーブルは各モジュールの _ensure_tables() で作成済みの前提のため、
+            # 存在確認は verify_table=True のときだけ行う (結果は _known_tables にキャッシュ)
+            if verify_table:
+                try:
+                    if not self.table_exists(table_name):
+                         logger.warning(f"Table '{table_name}' does not appear to exist in information_schema.tables. "
+                                        "It's assumed to be created by schema definitions elsewhere, or this check might be incomplete.")
+                except Exception as e:
+                    logger.warning(f"Could not robustly verify existence of table '{table_name}' using information_schema: {e}")
 
             if check_duplicate_master_key:
-                insert_query = f"""
-                INSERT INTO {quoted_table_name} ({cols_sql_fragment})
-                SELECT {cols_sql_fragment} FROM {quoted_temp_view_name}
-                ON CONFLICT ("{conflict_target_column}") DO NOTHING;
-                """
-                logger.info(f"Executing INSERT ON CONFLICT query for table {quoted_table_name} from view {quoted_temp_view_name}.")
-            else:
-                insert_query = f"INSERT INTO {quoted_table_name} ({cols_sql_fragment}) SELECT {cols_sql_fragment} FROM {quoted_temp_view_name};"
-                logger.info(f"Executing INSERT query for table {quoted_table_name} from view {quoted_temp_view_name}.")
-            
-            try:
-                self.execute_query(insert_query, commit=False)
-                
-                changes_result = self.execute_query("SELECT changes();", commit=False).fetchone()
-                if changes_result:
-                    inserted_rows = changes_result[0]
-                
-                self._connection.commit()
-                logger.info(f"Successfully inserted {inserted_rows} rows into table {quoted_table_name}. (Attempted: {len(df)})")
+                self._ensure_master_key_index(table_name)
+                attempted_rows = len(df)
+                df = self._drop_existing_master_keys(df, table_name)
+                if df.empty:
+                    logger.info("All %d rows already exist in table %s. No rows inserted.", attempted_rows, quoted_table_name)
+                    return 0
 
-            except duckdb.Error as e:
-                logger.error(f"Database error during insert into {quoted_table_name} from {quoted_temp_view_name}: {e}", exc_info=True)
+            # チャンク単位で登録・挿入し、ピークメモリをチャンクサイズに抑える。
+            # 全チャンクを1トランザクションにまとめ、途中で失敗した場合は全体を取り消す。
+            # 呼び出し側の transaction() 内であれば、そのトランザクションに含める。
+            temp_view_name, insert_sql = self._get_insert_sql(table_name, tuple(df.columns))
+            with self.transaction():
+                # 同名で register すると既存ビューが置き換わるため、解除はループ後の1回のみ
                 try:
-                    self._connection.rollback()
-                    logger.info("Rolled back transaction due to error.")
-                except Exception as rb_e:
-                    logger.error(f"Failed to rollback transaction: {rb_e}")
-                raise
-            except Exception as e:
-                logger.error(f"Unexpected error during insert into {quoted_table_name} from {quoted_temp_view_name}: {e}", exc_info=True)
+                    for start in range(0, len(df), chunk_rows):
+                        chunk = df.iloc[start:start + chunk_rows]
+                        self._connection.register(temp_view_name, _to_scan_source(chunk))
+                        # INSERT の結果セットは実際に挿入された行数を1行で返す
+                        row = self._connection.execute(insert_sql).fetchone()
+                        inserted_rows += row[0] if row else len(chunk)
+                finally:
+                    self._connection.unregister(temp_view_name)
+            logger.info("Successfully inserted %d rows into table %s.", inserted_rows, quoted_table_name)
+
+        except Exception as e:
+            logger.error(f"Error during insert into {quoted_table_name}: {e}", exc_info=True)
+            raise
+
+        return inserted_rows
+
+    def _get_insert_sql(self, table_name: str, columns: Tuple[str, ...]) -> Tuple[str, str]:
+        """
+        テーブルと列の組み合わせごとの INSERT 文をキャッシュから返す。
+
+        一時ビュー名はテーブルごとに固定し、同じ組み合わせでは同一の SQL 文字列を
+        再利用する。ビューは cursor 単位で登録されるため、他の接続とは衝突しない。
+        """
+        temp_view_name = f"tmp__{table_name}"
+        key = (table_name, columns)
+        insert_sql = self._insert_sql.get(key)
+        if insert_sql is None:
+            column_list = _quoted_column_list(columns)
+            insert_sql = (
+                f'INSERT INTO "{table_name}" ({column_list}) '
+                f'SELECT {column_list} FROM "{temp_view_name}"'
+            )
+            self._insert_sql[key] = insert_sql
+        return temp_view_name, insert_sql
+
+    def _ensure_master_key_index(self, table_name: str) -> None:
+        """
+        master_key に PRIMARY KEY / UNIQUE 制約がないテーブルには一意索引を作成する。
+
+        既存キーとの照合を ART 索引で行い、テーブルが大きくなっても照合コストを
+        バッチサイズ程度に抑えるため。確認はテーブルごとにプロセス内で1回のみ行う。
+        既存データに重複がある場合は索引を作成できないため、事前に重複を確認し、
+        警告のみ出して索引なしで続行する。失敗した文はトランザクション全体を
+        中断させるため、CREATE INDEX の失敗を握りつぶすのはトランザクション外に限る。
+        """
+        key = (self.db_path, table_name)
+        if self.read_only or key in _MASTER_KEY_INDEXED or not self.table_exists(table_name):
+            return
+
+        constrained = self._connection.execute(
+            "SELECT 1 FROM duckdb_constraints() "
+            "WHERE schema_name = 'main' AND table_name = ? "
+            "AND constraint_type IN ('PRIMARY KEY', 'UNIQUE') "
+            "AND constraint_column_names = ['master_key'] LIMIT 1",
+            [table_name],
+        ).fetchone()
+        if not constrained:
+            duplicated = self._connection.execute(
+                f'SELECT master_key FROM "{table_name}" '
+                f'GROUP BY master_key HAVING count(*) > 1 LIMIT 1'
+            ).fetchone()
+            if duplicated:
+                logger.warning(
+                    f"Table \"{table_name}\" already has duplicate master_key values "
+                    f"(e.g. {duplicated[0]!r}); skipping unique index creation."
+                )
+            else:
                 try:
-                    self._connection.rollback()
-                    logger.info("Rolled back transaction due to unexpected error.")
-                except Exception as rb_e:
-                    logger.error(f"Failed to rollback transaction: {rb_e}")
-                raise
-        
+                    self._connection.execute(
+                        f'CREATE UNIQUE INDEX IF NOT EXISTS "idx_{table_name}_master_key" '
+                        f'ON "{table_name}" (master_key)'
+                    )
+                    logger.info(f"Created unique index on master_key for table \"{table_name}\".")
+                except duckdb.Error as e:
+                    # トランザクション内では後続の文がすべて失敗するため、呼び出し側に伝える
+                    if self._in_transaction:
+                        raise
+                    logger.warning(f"Could not create unique index on master_key for table \"{table_name}\": {e}")
+        _MASTER_KEY_INDEXED.add(key)
+
+    def _drop_existing_master_keys(self, df: pd.DataFrame, table_name: str) -> pd.DataFrame:
+        """
+        テーブルに既に存在する master_key の行と、DataFrame 内で重複する行を取り除く。
+
+        投入バッチのキーだけを一時ビューとして登録し、テーブル側の主キー索引で
+        照合するため、走査コストはテーブル全体ではなくバッチサイズに比例する。
+        """
+        df = df.drop_duplicates(subset='master_key', keep='first')
+
+        probe_view_name = f"tmp_keys__{table_name}"
+        self._connection.register(probe_view_name, _to_scan_source(df[['master_key']]))
+        try:
+            existing = self._connection.execute(
+                f'SELECT master_key FROM "{table_name}" '
+                f'WHERE master_key IN (SELECT master_key FROM "{probe_view_name}")'
+            ).arrow()
         finally:
-            try:
-                self.drop_view(temp_view_name)
-            except Exception as e_drop:
-                logger.warning(f"Could not drop temporary view {temp_view_name}: {e_drop}")
+            self._connection.unregister(probe_view_name)
 
-        return inserted_rows
+        if existing.num_rows:
+            logger.info("Skipping %d rows whose master_key already exists in table \"%s\".", existing.num_rows, table_name)
+            df = df[~df['master_key'].isin(existing.column('master_key').to_pylist())]
+        return df
 
 # Example usage of the context manager
 if __name__ == "__main__":
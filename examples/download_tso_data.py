@@ -8,7 +8,9 @@
 
 import logging
 import argparse
-from datetime import datetime, timedelta
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
 import sys
 import os
 
@@ -48,14 +50,14 @@ def parse_args():
     
     parser.add_argument(
         '--start-date',
-        type=lambda s: datetime.strptime(s, '%Y-%m-%d').date(),
+        type=date.fromisoformat,
         help='ダウンロードを開始する日付 (YYYY-MM-DD)',
         default=(datetime.now() - timedelta(days=7)).date()
     )
     
     parser.add_argument(
         '--end-date',
-        type=lambda s: datetime.strptime(s, '%Y-%m-%d').date(),
+        type=date.fromisoformat,
         help='ダウンロードを終了する日付 (YYYY-MM-DD)',
         default=datetime.now().date()
     )
@@ -81,6 +83,29 @@ def parse_args():
     
     return parser.parse_args()
 
+def download_tso(tso_id, args):
+    """
+    1つの電力会社について指定期間のデータをダウンロードしてDBに保存します。
+
+    同一ホストへのリクエストはこの中で逐次実行され、download_files の待機時間で間隔が空きます。
+    DB接続はワーカーごとに作成します（プール済みの接続から個別の cursor を取得）。
+    """
+    db_connection = DuckDBConnection(args.db_path)
+    try:
+        with UnifiedTSODownloader(
+            tso_id=tso_id,
+            db_connection=db_connection,
+            url_type=args.url_type
+        ) as downloader:
+            return downloader.download_files(
+                start_date=args.start_date,
+                end_date=args.end_date,
+                sleep_min=2,
+                sleep_max=5
+            )
+    finally:
+        db_connection.close()
+
 def main():
     """電力会社（TSO）データをダウンロードするメイン関数。"""
     args = parse_args()
@@ -92,33 +117,25 @@ def main():
         logger.info(f"すべての電力会社の {args.url_type} データをダウンロードします")
         logger.info(f"日付範囲: {args.start_date} から {args.end_date}")
     
-    # データベース接続を作成
-    db_connection = DuckDBConnection(args.db_path)
-    
-    # ダウンローダーを作成
-    downloader = UnifiedTSODownloader(
-        tso_id=args.tso_id,  # None の場合はすべての TSO がダウンロードされます
-        db_connection=db_connection,
-        url_type=args.url_type
-    )
+    tso_ids = [args.tso_id] if args.tso_id else TSO_IDS
     
     try:
-        # 指定された日付範囲のファイルをダウンロード
-        results = downloader.download_files(
-            start_date=args.start_date,
-            end_date=args.end_date,
-            sleep_min=2,
-            sleep_max=5
-        )
+        # 電力会社ごと（＝ホストごと）に1ワーカーを割り当て、異なるホストへの取得を並行させる
+        results = []
+        with ThreadPoolExecutor(max_workers=len(tso_ids)) as executor:
+            futures = {executor.submit(download_tso, tso_id, args): tso_id for tso_id in tso_ids}
+            for future in as_completed(futures):
+                try:
+                    results.extend(future.result())
+                except Exception as e:
+                    logger.error(f"{futures[future]} のダウンロード中にエラーが発生しました: {str(e)}")
         
         # 結果のサマリーを表示
-        tso_counts = {}
-        for _, tso_id, _ in results:
-            tso_counts[tso_id] = tso_counts.get(tso_id, 0) + 1
+        tso_counts = Counter(tso_id for _, tso_id, _ in results)
         
         logger.info(f"合計 {len(results)} 日分のデータをダウンロードしました")
         
-        for tso_id, count in tso_counts.items():
+        for tso_id, count in tso_counts.most_common():
             logger.info(f"{TSO_INFO[tso_id]['name']}: {count} 日分")
             
     except Exception as e:
@@ -10,6 +10,7 @@ import os
 import sys
 from datetime import date, timedelta
 import duckdb
+import pandas as pd
 
 # プロジェクトのルートディレクトリをパスに追加
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -28,14 +29,17 @@ def main():
     end_date = date.today()
     start_date = end_date - timedelta(days=6)
     print(f"TSOデータを {start_date} から {end_date} までダウンロードして保存します...")
-    rows = importer.import_from_downloader(start_date=start_date, end_date=end_date)
+    dates = pd.date_range(start_date, end_date, freq='D').date
+    rows = importer.import_from_downloader(dates=dates)
     print(f"{rows} 行のTSOデータをtso_dataテーブルに保存しました。")
 
     print("\nTSOデータサンプル (tso_data):")
     con = duckdb.connect(db_path)
+    # 最新日付に絞ってから並べ替える (全行のソートを避け、ゾーンマップで他の日付のブロックを読み飛ばす)
     result = con.execute("""
         SELECT * FROM tso_data
-        ORDER BY date DESC, slot
+        WHERE date = (SELECT max(date) FROM tso_data)
+        ORDER BY slot
         LIMIT 5
     """)
     rows = result.fetchall()
@@ -6,16 +6,14 @@ This script provides a command-line interface for downloading JEPX (Japan Electr
 for a specified date range. The downloaded data is displayed and optionally saved to a database.
 """
 
+import functools
 import logging
 import sys
 import os
-import pandas as pd
 from datetime import datetime, timedelta
-from tabulate import tabulate
 import time
 import random
-import json
-from typing import Optional, List, Dict, Any, Tuple
+from typing import Optional, List, Dict, Any, Callable, Tuple
 
 # Add the parent directory to sys.path to allow imports from data_sources
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -37,6 +35,56 @@ JEPX_DATA_TYPES = {
     # Add other JEPX data types as they are implemented
 }
 
+@functools.lru_cache(maxsize=1)
+def _json_loads() -> Callable[[Any], Any]:
+    """
+    入札データのJSONデコーダを返す。表示時に初めて読み込む。
+
+    orjson があれば高速なC実装を使い、なければ標準ライブラリにフォールバックする。
+    """
+    try:
+        import orjson as json_module
+    except ImportError:
+        import json as json_module
+    return json_module.loads
+
+@functools.lru_cache(maxsize=1)
+def _db() -> DuckDBConnection:
+    """表示用のDB接続を1つだけ作成し、以降の問い合わせで使い回す。"""
+    return DuckDBConnection()
+
+# 表示用クエリ (データ種別ID -> (SQL, 日付列の書式))
+# 先頭10件と期間内の総件数を1回のスキャンで取得する (COUNT(*) OVER () は LIMIT 前に評価される)
+_DISPLAY_QUERIES = {
+    "1": ("""
+            SELECT date, slot, area_code, bid, COUNT(*) OVER () AS total_count
+            FROM jepx_bid_data
+            WHERE date BETWEEN ? AND ?
+            ORDER BY date, slot, area_code
+            LIMIT 10
+        """, "%Y%m%d"),
+    "2": ("""
+            SELECT date, slot, ap0_system, ap3_tokyo, ap6_kansai, contract_qty_kwh,
+                   COUNT(*) OVER () AS total_count
+            FROM jepx_da_price
+            WHERE date BETWEEN ? AND ?
+            ORDER BY date, slot
+            LIMIT 10
+        """, "%Y-%m-%d"),
+}
+
+@functools.lru_cache(maxsize=64)
+def _fetch_display_rows(data_type_id: str, start_iso: str, end_iso: str) -> Tuple[Tuple, ...]:
+    """
+    表示用の行を取得してキャッシュする。
+
+    同じ期間を繰り返し表示する場合はDBに問い合わせない。
+    ダウンロードでデータが変わるため、ダウンロード後に cache_clear() すること。
+    """
+    query, date_format = _DISPLAY_QUERIES[data_type_id]
+    params = tuple(datetime.fromisoformat(d).strftime(date_format) for d in (start_iso, end_iso))
+    return tuple(_db().execute_query(query, params, commit=False).fetchall())
+
 def print_header() -> None:
     """Display the application header and instructions."""
     print("\n" + "=" * 60)
@@ -86,8 +134,8 @@ def get_date_selection() -> Tuple[datetime, datetime]:
             end_date_str = default_end_str
         
         try:
-            start_date = datetime.strptime(start_date_str, "%Y-%m-%d")
-            end_date = datetime.strptime(end_date_str, "%Y-%m-%d")
+            start_date = datetime.fromisoformat(start_date_str.strip())
+            end_date = datetime.fromisoformat(end_date_str.strip())
             
             if start_date > end_date:
                 print("Error: Start date must be before or equal to end date.")
@@ -99,24 +147,15 @@ def get_date_selection() -> Tuple[datetime, datetime]:
 
 def display_bid_data(data_type_id: str, start_date: datetime, end_date: datetime) -> None:
     """Display JEPX bid data from the database."""
+    from tabulate import tabulate
+
     data_type = JEPX_DATA_TYPES[data_type_id]
     table_name = data_type["table"]
     
     try:
-        db = DuckDBConnection()
-        
-        # Query to fetch data for the specified date range
-        query = f"""
-            SELECT date, slot, area_code, bid 
-            FROM {table_name}
-            WHERE date BETWEEN ? AND ?
-            ORDER BY date, slot, area_code
-            LIMIT 10
-        """
-        
-        results = db.execute_query(
-            query, 
-            (start_date.strftime("%Y%m%d"), end_date.strftime("%Y%m%d"))
+        # Fetch data for the specified date range (cached per range)
+        results = _fetch_display_rows(
+            data_type_id, start_date.date().isoformat(), end_date.date().isoformat()
         )
         
         if not results:
@@ -126,10 +165,11 @@ def display_bid_data(data_type_id: str, start_date: datetime, end_date: datetime
         print(f"\nShowing first 10 records from {table_name} for {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}:")
         
         # Create a formatted display of the data
+        json_loads = _json_loads()
         rows = []
         for row in results:
-            date, slot, area_code, bid_json = row
-            bid_data = json.loads(bid_json) if isinstance(bid_json, str) else bid_json
+            date, slot, area_code, bid_json, _ = row
+            bid_data = json_loads(bid_json) if type(bid_json) is str else bid_json
             # Take just the first bid point for display
             first_bid = bid_data[0] if bid_data else {}
             
@@ -146,16 +186,8 @@ def display_bid_data(data_type_id: str, start_date: datetime, end_date: datetime
         headers = ["Date", "Slot", "Area Code", "Price", "Sell Qty", "Buy Qty", "Total Points"]
         print(tabulate(rows, headers=headers, tablefmt="pretty"))
         
-        # Show how many records total
-        count_query = f"""
-            SELECT COUNT(*) FROM {table_name}
-            WHERE date BETWEEN ? AND ?
-        """
-        count = db.execute_query(
-            count_query, 
-            (start_date.strftime("%Y%m%d"), end_date.strftime("%Y%m%d"))
-        )
-        total_count = count[0][0] if count else 0
+        # Show how many records total (LIMIT 前に評価されるウィンドウ集計で取得済み)
+        total_count = results[0][-1]
         
         print(f"\nTotal records in database for this period: {total_count}")
         
@@ -165,24 +197,15 @@ def display_bid_data(data_type_id: str, start_date: datetime, end_date: datetime
 
 def display_price_data(data_type_id: str, start_date: datetime, end_date: datetime) -> None:
     """Display JEPX price data from the database."""
+    from tabulate import tabulate
+
     data_type = JEPX_DATA_TYPES[data_type_id]
     table_name = data_type["table"]
     
     try:
-        db = DuckDBConnection()
-        
-        # Query to fetch data for the specified date range
-        query = f"""
-            SELECT date, slot, ap0_system, ap3_tokyo, ap6_kansai, contract_qty_kwh
-            FROM {table_name}
-            WHERE date BETWEEN ? AND ?
-            ORDER BY date, slot
-            LIMIT 10
-        """
-        
-        results = db.execute_query(
-            query, 
-            (start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d"))
+        # Fetch data for the specified date range (cached per range)
+        results = _fetch_display_rows(
+            data_type_id, start_date.date().isoformat(), end_date.date().isoformat()
         )
         
         if not results:
@@ -194,7 +217,7 @@ def display_price_data(data_type_id: str, start_date: datetime, end_date: dateti
         # Create a formatted display of the data
         rows = []
         for row in results:
-            date, slot, system_price, tokyo_price, kansai_price, contract_qty = row
+            date, slot, system_price, tokyo_price, kansai_price, contract_qty, _ = row
             rows.append([
                 date,
                 slot,
@@ -207,16 +230,8 @@ def display_price_data(data_type_id: str, start_date: datetime, end_date: dateti
         headers = ["Date", "Slot", "System Price", "Tokyo Price", "Kansai Price", "Contract Qty (kWh)"]
         print(tabulate(rows, headers=headers, tablefmt="pretty"))
         
-        # Show how many records total
-        count_query = f"""
-            SELECT COUNT(*) FROM {table_name}
-            WHERE date BETWEEN ? AND ?
-        """
-        count = db.execute_query(
-            count_query, 
-            (start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d"))
-        )
-        total_count = count[0][0] if count else 0
+        # Show how many records total (LIMIT 前に評価されるウィンドウ集計で取得済み)
+        total_count = results[0][-1]
         
         print(f"\nTotal records in database for this period: {total_count}")
         
@@ -258,6 +273,9 @@ def download_and_display_data(data_type_id: str, start_date: datetime, end_date:
         
         print("\nDownload completed successfully!")
         
+        # 新しいデータが保存されたため、表示用のキャッシュを破棄
+        _fetch_display_rows.cache_clear()
+        
         # Display the data that was just downloaded
         display_data(data_type_id, start_date, end_date)
         
@@ -7,12 +7,13 @@
 選択されたデータはダウンロードされ、コンソールに表示されます。
 """
 
+import asyncio
 import logging
 import sys
 import os
-import pandas as pd
 from datetime import datetime, date
-from typing import Dict, List, Optional, Tuple
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 
 # 親ディレクトリをパスに追加してモジュールをインポートできるようにする
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -20,8 +21,23 @@ project_root = os.path.dirname(current_dir)
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
-from data_sources.tso.unified_downloader import UnifiedTSODownloader
-from data_sources.tso.tso_url_templates import TSO_INFO, get_tso_id_from_area_code
+from data_sources.tso.downloader import TSODataDownloader
+from data_sources.tso.tso_url_templates import TSO_INFO, get_tso_id_from_area_code, get_tso_url
+
+# pandas（パーサ経由を含む）と tabulate はダウンロード・表示時に初めて読み込み、
+# メニュー表示までの起動時間を短くする
+if TYPE_CHECKING:
+    import pandas as pd
+    from data_sources.tso.parser import TSODataParser
+
+# エリアコード順のTSO一覧と選択肢はインポート時に1回だけ作成する
+_TSO_SORTED = tuple(sorted(TSO_INFO.items(), key=lambda x: x[1]['area_code']))
+_AREA_CODES = tuple(info['area_code'] for _, info in _TSO_SORTED)
+_TSO_CHOICES = MappingProxyType({
+    **{str(i): tso_id for i, (tso_id, _) in enumerate(_TSO_SORTED, 1)},
+    "A": "all",
+    "a": "all",
+})
 
 # ロギングを設定
 logging.basicConfig(
@@ -46,9 +62,7 @@ def print_tso_choices():
     print("-" * 60)
     
     # Sort by area code for consistent display
-    sorted_tsos = sorted(TSO_INFO.items(), key=lambda x: x[1]['area_code'])
-    
-    for tso_id, info in sorted_tsos:
+    for tso_id, info in _TSO_SORTED:
         print(f"{info['area_code']:<6} {info['name']:<40} {info['region']:<10}")
     
     print("-" * 60)
@@ -56,16 +70,13 @@ def print_tso_choices():
 def get_area_code():
     """Get area code selection from the user."""
     while True:
-        # Get all available area codes
-        area_codes = sorted([info['area_code'] for info in TSO_INFO.values()])
-        
-        print("\nPlease enter the area code (e.g., 01, 02, 03...):")
+        print("\nPlease enter the area code (e.g., 1, 2, 3...), or A for all areas:")
         area_code = input("Area code: ").strip()
         
-        if area_code in area_codes:
-            return area_code
+        if area_code in _AREA_CODES or area_code.upper() == "A":
+            return area_code.upper()
         else:
-            print(f"Invalid area code. Please choose from: {', '.join(area_codes)}")
+            print(f"Invalid area code. Please choose from: {', '.join(_AREA_CODES)}")
 
 def get_year_and_month():
     """Get year and month from user input."""
@@ -107,18 +118,14 @@ def display_tso_choices() -> Dict[str, str]:
     Returns:
         選択肢のキーとTSO IDのマッピング
     """
-    tso_choices = {}
     print("◆ 対象のエリアを選択してください:")
     
-    for i, (tso_id, info) in enumerate(sorted(TSO_INFO.items(), key=lambda x: x[1]['area_code']), 1):
-        tso_choices[str(i)] = tso_id
+    for i, (tso_id, info) in enumerate(_TSO_SORTED, 1):
         print(f"  {i}. [{info['area_code']}] {info['name']} ({info['region']})")
     
     print(f"  A. すべてのエリア")
-    tso_choices["A"] = "all"
-    tso_choices["a"] = "all"
     
-    return tso_choices
+    return _TSO_CHOICES
 
 def get_tso_selection(tso_choices: Dict[str, str]) -> List[str]:
     """
@@ -137,7 +144,7 @@ def get_tso_selection(tso_choices: Dict[str, str]) -> List[str]:
             selected_tso = tso_choices[selection]
             if selected_tso == "all":
                 print("\n✓ すべてのエリアを選択しました。")
-                return list(TSO_INFO.keys())
+                return [tso_id for tso_id, _ in _TSO_SORTED]
             else:
                 info = TSO_INFO[selected_tso]
                 print(f"\n✓ 選択されたエリア: [{info['area_code']}] {info['name']} ({info['region']})")
@@ -189,12 +196,59 @@ def get_date_selection() -> Tuple[int, int]:
     print(f"\n✓ 選択された期間: {year}年{month}月")
     return year, month
 
+async def _fetch_raw(downloader: TSODataDownloader, tso_id: str, target_date: date, queue: asyncio.Queue) -> None:
+    """
+    1つのTSOの生データ（CSV/ZIP）を取得してキューに渡します（プロデューサー）。
+    取得に失敗した場合も、コンシューマーが待ち続けないよう content=None を渡します。
+    """
+    url, content = '', None
+    try:
+        url = get_tso_url(tso_id, 'demand', target_date)
+        content = await asyncio.to_thread(downloader.fetch_data, tso_id, url, target_date)
+    except Exception as e:
+        logger.warning(f"{tso_id} のダウンロードに失敗しました: {e}")
+    await queue.put((tso_id, url, content))
+
+async def _parse_all(parser: "TSODataParser", count: int, target_date: date, queue: asyncio.Queue) -> Dict[str, Optional["pd.DataFrame"]]:
+    """
+    キューに届いた順に生データをパースします（コンシューマー）。
+    パースはスレッドで実行し、残りのTSOのダウンロード待ちと重ねます。
+    """
+    loop = asyncio.get_running_loop()
+    frames = {}
+    for _ in range(count):
+        tso_id, url, content = await queue.get()
+        df = None
+        if content:
+            df = await loop.run_in_executor(None, parser.parse_data, content, tso_id, target_date, url)
+        frames[tso_id] = df.assign(tso_id=tso_id) if df is not None and not df.empty else None
+    return frames
+
+async def _download_all(tso_ids: List[str], target_date: date) -> List[Optional["pd.DataFrame"]]:
+    """
+    TSOごとのダウンロードを並行して実行し、届いたものから順にパースします。
+
+    各TSOは別ホストのため取得を同時に走らせ、全エリア分の待ち時間をほぼ1エリア分に短縮します。
+    キューの上限で、パース待ちの生データを保持するメモリを抑えます。
+    """
+    from data_sources.tso.parser import TSODataParser
+
+    parser = TSODataParser()
+    queue = asyncio.Queue(maxsize=4)
+    # 1つのダウンローダー（HTTPセッション）を全TSOで共有し、接続を使い回す
+    with TSODataDownloader() as downloader:
+        *_, frames = await asyncio.gather(
+            *(_fetch_raw(downloader, tso_id, target_date, queue) for tso_id in tso_ids),
+            _parse_all(parser, len(tso_ids), target_date, queue),
+        )
+    return [frames[tso_id] for tso_id in tso_ids]
+
 def download_and_display_data(area_code, year, month):
     """
     Download data for the specified area code and date.
     
     Args:
-        area_code (str): The area code to download data for
+        area_code (str): The area code to download data for ("A" for all areas)
         year (int): The year to download data for
         month (int): The month to download data for
         
@@ -202,26 +256,28 @@ def download_and_display_data(area_code, year, month):
         pd.DataFrame or None: The downloaded data or None if download failed
     """
     try:
-        # Get TSO ID from area code
-        tso_id = get_tso_id_from_area_code(area_code)
-        if not tso_id:
-            print(f"No TSO found for area code {area_code}")
-            return None
+        # Get TSO IDs from area code
+        if area_code == "A":
+            tso_ids = [tso_id for tso_id, _ in _TSO_SORTED]
+        else:
+            tso_ids = [get_tso_id_from_area_code(area_code)]
         
         # Create target date
-        target_date = pd.Timestamp(year=year, month=month, day=1)
+        target_date = date(year, month, 1)
         
-        # Create downloader
-        downloader = UnifiedTSODownloader(tso_id=tso_id)
+        # Download data (TSOごとに並行取得し、届いた順にパース)
+        frames = asyncio.run(_download_all(tso_ids, target_date))
         
-        # Download data
-        data = downloader.download_for_month(target_date)
+        for tso_id, df in zip(tso_ids, frames):
+            if df is None:
+                print(f"No data available for {tso_id} in {year}-{month:02d}")
         
-        if data is None or data.empty:
-            print(f"No data available for {tso_id} in {year}-{month:02d}")
+        frames = [df for df in frames if df is not None]
+        if not frames:
             return None
-            
-        return data
+        
+        import pandas as pd
+        return pd.concat(frames, ignore_index=True)
         
     except Exception as e:
         logging.error(f"Error downloading data: {str(e)}", exc_info=True)
@@ -235,22 +291,24 @@ def display_results(df):
     Args:
         df (pd.DataFrame): The data to display
     """
+    from tabulate import tabulate
+
     # Display basic info
     print(f"\nDownloaded data contains {len(df)} rows")
     
     # Show data summary
     print("\nData summary:")
-    print(f"Time range: {df['datetime'].min()} to {df['datetime'].max()}")
+    print(f"Time range: {df['date'].min()} to {df['date'].max()}")
     
-    # Display the first few rows
+    # Display the first few rows (pandas の文字列整形を通さず、NumPy 配列を tabulate で表示)
     print("\nSample data:")
-    print(df.head().to_string())
+    head = df.head(10)
+    print(tabulate(head.to_numpy(), headers=list(head.columns), tablefmt="plain"))
     
     # Ask if user wants to see more
     if input("\nShow full dataset? (y/n): ").lower() == 'y':
-        pd.set_option('display.max_rows', None)
-        print(df.to_string())
-        pd.reset_option('display.max_rows')
+        # 全体を1つの巨大な文字列にせず、チャンクごとに標準出力へ書き出す
+        df.to_csv(sys.stdout, sep='\t', index=False, chunksize=5000)
 
 def main():
     """Run the interactive TSO data downloader CLI application."""
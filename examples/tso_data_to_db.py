@@ -11,16 +11,17 @@ import os
 import sys
 import logging
 import argparse
-from datetime import datetime, timedelta
+from datetime import date, timedelta
+from pathlib import Path
 import pandas as pd
-from typing import List, Dict
+from typing import List, Dict, Optional
 import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from data_sources.tso.db_importer import TSODataImporter
 from data_sources.tso.unified_downloader import UnifiedTSODownloader
 from db.duckdb_connection import DuckDBConnection
-from data_sources.tso.tso_urls import TSO_INFO
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(
@@ -41,7 +42,13 @@ AREA_ORDER = [
     (9, 'kyushu'),
 ]
 
-# 項目名の英語変換
+# 横持ちテーブルは列数が多い (9エリア×項目数) ため、保存時の Arrow 変換を小さめのチャンクに分ける
+WIDE_CHUNK_ROWS = 50_000
+
+# ダウンロード済みデータのキャッシュ先 (TSO ID・年月ごとの Parquet)
+CACHE_DIR = Path(os.getenv("TSO_CACHE_DIR", Path.home() / ".cache" / "powermarketdata" / "tso"))
+
+# 項目名 (日本語, 英語)。TSODataParser の出力の列名は英語側
 ITEMS = [
     ('エリア需要', 'area_demand'),
     ('原子力', 'nuclear'),
@@ -63,18 +70,21 @@ ITEMS = [
     ('合計', 'total'),
 ]
 
+# tso_data の列順
+WIDE_COLUMNS = [
+    'master_key', 'date', 'slot',
+    *(f'{area_num}_{en}' for area_num, _ in AREA_ORDER for _, en in ITEMS),
+]
+
 def parse_args():
     parser = argparse.ArgumentParser(description="Download TSO data and store in wide-format table")
-    parser.add_argument('--start-date', type=lambda d: datetime.strptime(d, "%Y-%m-%d").date(), required=True)
-    parser.add_argument('--end-date', type=lambda d: datetime.strptime(d, "%Y-%m-%d").date(), required=True)
+    parser.add_argument('--start-date', type=date.fromisoformat, required=True)
+    parser.add_argument('--end-date', type=date.fromisoformat, required=True)
     parser.add_argument('--log-level', type=str, default="INFO")
+    parser.add_argument('--ignore-cache', action='store_true',
+                        help='Parquet キャッシュを使わずに再ダウンロードする')
     return parser.parse_args()
 
-def time_to_slot(time_str: str) -> int:
-    # "00:00"→1, "23:30"→48
-    h, m = map(int, time_str.split(":"))
-    return h * 2 + (1 if m == 0 else 2)
-
 def debug_table_info(db: DuckDBConnection, table: str):
     try:
         cols = db.execute_query(f"PRAGMA table_info({table})").fetchall()
@@ -84,70 +94,166 @@ def debug_table_info(db: DuckDBConnection, table: str):
     except Exception as e:
         print(f"[DEBUG] Table {table} does not exist or error: {e}")
 
+def _month_starts(start_date: date, end_date: date) -> List[date]:
+    """期間に含まれる各月の1日を返す"""
+    months = []
+    current = start_date.replace(day=1)
+    while current <= end_date:
+        months.append(current)
+        current = (current + timedelta(days=32)).replace(day=1)
+    return months
+
+def _cache_path(tso_id: str, month_start: date) -> Path:
+    return CACHE_DIR / f"{tso_id}_{month_start:%Y%m}.parquet"
+
+def _load_area_data(downloader: UnifiedTSODownloader, tso_id: str, start_date: date, end_date: date,
+                    use_cache: bool) -> List[pd.DataFrame]:
+    """
+    期間内のパース済みデータを返す。
+
+    TSOのデータは月単位のファイルで、過去月は内容が変わらないため (TSO ID, 年月) ごとに
+    Parquet にキャッシュし、再実行時はその月をダウンロードせずに読み込む。
+    当月以降はデータが追加されるためキャッシュしない。
+    """
+    this_month = date.today().replace(day=1)
+    months = _month_starts(start_date, end_date)
+    dfs = []
+    if use_cache:
+        cached = [m for m in months if m < this_month and _cache_path(tso_id, m).exists()]
+        for month_start in cached:
+            logger.info(f"Using cached data for {tso_id} {month_start:%Y-%m}")
+            dfs.append(pd.read_parquet(_cache_path(tso_id, month_start), engine='pyarrow'))
+        months = [m for m in months if m not in cached]
+    if not months:
+        return dfs
+
+    # キャッシュにない月はまとめて1回でダウンロードする (中部の年間ZIPを月ごとに取り直さない)
+    month_end = (months[-1] + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    results = downloader.download_files(months[0], month_end)
+    downloaded = [df for _, _, df in results if df is not None and not df.empty]
+    dfs.extend(downloaded)
+
+    if downloaded:
+        try:
+            combined = pd.concat(downloaded, ignore_index=True)
+            month_keys = pd.to_datetime(combined['date'], format='%Y%m%d').dt.to_period('M')
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            for period, month_df in combined.groupby(month_keys):
+                month_start = period.to_timestamp().date()
+                if month_start < this_month:
+                    month_df.to_parquet(_cache_path(tso_id, month_start), engine='pyarrow',
+                                        compression='snappy', index=False)
+        except Exception as e:
+            logger.warning(f"Failed to write cache for {tso_id}: {e}")
+    return dfs
+
+def _fetch_area(area_num: int, tso_id: str, start_date, end_date, use_cache: bool = True) -> Optional[pd.DataFrame]:
+    """1エリア分をダウンロードし、(date, slot, 各項目) の DataFrame を返す"""
+    logger.info(f"Downloading data for area {area_num}: {tso_id}")
+    with UnifiedTSODownloader(tso_ids=[tso_id], url_type='demand') as downloader:
+        dfs = _load_area_data(downloader, tso_id, start_date, end_date, use_cache)
+    if not dfs:
+        logger.warning(f"No data for {tso_id}")
+        return None
+    df = pd.concat(dfs, ignore_index=True)
+    # TSODataParser の出力は英語の項目名・YYYYMMDD の date・整数の slot (1-48) になっている
+    select_cols = ['date', 'slot', *(en for _, en in ITEMS)]
+    df = df[[c for c in select_cols if c in df.columns]].copy()
+    df['area_num'] = area_num
+    return df
+
+def build_wide_df(all_area_dfs: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    エリアごとの DataFrame を1行=1スロットの横持ちにまとめる。
+
+    各エリアを縦持ち (date, slot, area_num, item, value) にまとめ、1回の pivot で横持ちにする。
+    北海道の (date, slot) を基準とし、同じスロットが複数ある場合は先頭の値を使う。
+    データのないエリアの列は NULL になる。
+    """
+    hokkaido_df = all_area_dfs['hokkaido']
+    long_frames = []
+    for area_num, tso_id in AREA_ORDER:
+        area_df = all_area_dfs.get(tso_id)
+        if area_df is None:
+            continue  # データのないエリアの列は後で NULL として追加する
+        item_cols = [en for _, en in ITEMS if en in area_df.columns]
+        long_frames.append(
+            area_df.melt(id_vars=['date', 'slot'], value_vars=item_cols, var_name='item')
+            .assign(area_num=area_num)
+        )
+    wide_df = pd.concat(long_frames, ignore_index=True).pivot_table(
+        index=['date', 'slot'], columns=['area_num', 'item'], values='value', aggfunc='first'
+    )
+    wide_df.columns = [f'{area_num}_{item}' for area_num, item in wide_df.columns]
+    base_keys = hokkaido_df[['date', 'slot']].drop_duplicates()
+    wide_df = wide_df.reindex(pd.MultiIndex.from_frame(base_keys)).reset_index()
+    wide_df.insert(0, 'master_key', wide_df['date'] + '_' + wide_df['slot'].map('{:02d}'.format))
+    wide_df['date'] = pd.to_datetime(wide_df['date'], format='%Y%m%d').dt.date
+    return wide_df.reindex(columns=WIDE_COLUMNS)
+
+def ensure_wide_table(db: DuckDBConnection) -> None:
+    """横持ちテーブル tso_data がなければ作成する (スキーマ定義には含まれていない)"""
+    item_cols = ',\n'.join(f'            "{col}" DOUBLE' for col in WIDE_COLUMNS[3:])
+    db.execute_query(f"""
+        CREATE TABLE IF NOT EXISTS tso_data (
+            master_key VARCHAR PRIMARY KEY,
+            date DATE,
+            slot INTEGER,
+{item_cols}
+        )
+    """)
+
 def main():
     args = parse_args()
     logging.getLogger().setLevel(getattr(logging, args.log_level))
+    importer = None
     try:
         # スキーマ定義から全テーブルを作成
         importer = TSODataImporter()
-        db = DuckDBConnection()
+        # テーブル作成に使った接続をそのまま保存にも使う (2本目の接続を開かない)
+        db = importer.connection
+        ensure_wide_table(db)
         print("[DEBUG] After ensure_tables() call:")
         debug_table_info(db, 'tso_data')
 
+        # エリアごとに別ホストからの取得になるため、全エリアを並行してダウンロードする
+        # (スレッドはソケットI/Oで待つため GIL の影響はほぼない)
         all_area_dfs: Dict[str, pd.DataFrame] = {}
-        for area_num, tso_id in AREA_ORDER:
-            logger.info(f"Downloading data for area {area_num}: {tso_id}")
-            downloader = UnifiedTSODownloader(tso_ids=[tso_id], url_type='demand')
-            results = downloader.download_files(args.start_date, args.end_date)
-            dfs = [df for _, _, df in results if df is not None and not df.empty]
-            if not dfs:
-                logger.warning(f"No data for {tso_id}")
-                continue
-            df = pd.concat(dfs, ignore_index=True)
-            col_map = {jp: en for jp, en in ITEMS}
-            select_cols = ['date', 'time_slot', *col_map.keys()]
-            df = df[[c for c in select_cols if c in df.columns]].copy()
-            df.rename(columns=col_map, inplace=True)
-            df['slot'] = df['time_slot'].apply(time_to_slot)
-            df['area_num'] = area_num
-            all_area_dfs[tso_id] = df
-
-        hokkaido_df = all_area_dfs.get('hokkaido')
-        if hokkaido_df is None:
+        with ThreadPoolExecutor(max_workers=len(AREA_ORDER)) as ex:
+            futures = {
+                ex.submit(_fetch_area, area_num, tso_id, args.start_date, args.end_date, not args.ignore_cache): tso_id
+                for area_num, tso_id in AREA_ORDER
+            }
+            for fut in as_completed(futures):
+                tso_id = futures[fut]
+                try:
+                    df = fut.result()
+                except Exception as e:
+                    logger.error(f"Failed to download {tso_id}: {e}")
+                    continue
+                if df is not None:
+                    all_area_dfs[tso_id] = df
+
+        if 'hokkaido' not in all_area_dfs:
             logger.error("No data for Hokkaido area. Cannot proceed.")
             sys.exit(1)
-        wide_rows = []
-        for idx, row in hokkaido_df.iterrows():
-            master_key = f"{row['date'].strftime('%Y%m%d')}_{row['slot']:02d}"
-            base = {
-                'master_key': master_key,
-                'date': row['date'],
-                'slot': row['slot'],
-            }
-            for area_num, tso_id in AREA_ORDER:
-                area_row = all_area_dfs[tso_id][
-                    (all_area_dfs[tso_id]['date'] == row['date']) & (all_area_dfs[tso_id]['slot'] == row['slot'])
-                ]
-                if not area_row.empty:
-                    area_row = area_row.iloc[0]
-                    for _, en in ITEMS:
-                        base[f'{area_num}_{en}'] = area_row.get(en, None)
-                else:
-                    for _, en in ITEMS:
-                        base[f'{area_num}_{en}'] = None
-            wide_rows.append(base)
-        wide_df = pd.DataFrame(wide_rows)
+        wide_df = build_wide_df(all_area_dfs)
         print(f"[DEBUG] wide_df shape: {wide_df.shape}")
         print(f"[DEBUG] wide_df columns: {list(wide_df.columns)}")
         print(f"[DEBUG] wide_df head:\n{wide_df.head()}")
         logger.info(f"Saving {len(wide_df)} rows to tso_data table...")
-        db.save_dataframe(wide_df, 'tso_data')
+        # save_dataframe は WIDE_CHUNK_ROWS 行ずつ pyarrow.Table に変換して登録し、
+        # 全チャンクの INSERT INTO ... SELECT を1トランザクションで実行する
+        db.save_dataframe(wide_df, 'tso_data', chunk_rows=WIDE_CHUNK_ROWS)
         print("[DEBUG] After save_dataframe:")
         debug_table_info(db, 'tso_data')
         logger.info("Done.")
     except Exception as e:
         logger.error(f"Error: {e}")
         print(traceback.format_exc())
+    finally:
+        if importer is not None:
+            importer.connection.close()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
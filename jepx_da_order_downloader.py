@@ -1,5 +1,7 @@
 #!/usr/bin/env python3
+import asyncio
 import requests
+from requests.adapters import HTTPAdapter
 from datetime import datetime, timedelta
 import sys
 import time
@@ -7,8 +9,23 @@ import random
 import os
 import argparse
 import sqlite3
+import zlib
 from dotenv import load_dotenv
 
+# httpx と h2 があれば HTTP/2 で1本の接続にリクエストを多重化する。
+# なければ requests をスレッドで並行実行する。
+try:
+    import httpx
+    import h2  # noqa: F401  httpx の HTTP/2 サポートに必要
+except ImportError:
+    httpx = None
+
+# CSV本文は圧縮して保存する。zstandard があれば zstd、なければ標準ライブラリの zlib を使う
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 # 環境変数の読み込み
 load_dotenv()
 DB_PATH = os.getenv("DB_PATH")
@@ -19,6 +36,26 @@ if not DB_PATH:
 # 定数設定
 BASE_URL = "https://www.jepx.jp/js/csv_read.php"
 DIR_NAMES = ["spot_bid_curves", "spot_splitting_areas"]
+# サーバーへの同時リクエスト数の上限
+MAX_CONCURRENT_REQUESTS = 5
+# HTTP 429 (Too Many Requests) を受けたときの再試行回数
+MAX_RETRIES_ON_429 = 3
+# リクエストヘッダー（セッション作成時に1回だけ設定する）
+HEADERS = {
+    'Accept': '*/*',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'Accept-Language': 'ja',
+    'Cache-Control': 'no-cache',
+    'Connection': 'keep-alive',
+    'Host': 'www.jepx.jp',
+    'If-Modified-Since': 'Thu, 01 Jun 1970 00:00:00 GMT',
+    'Pragma': 'no-cache',
+    'Referer': 'https://www.jepx.jp/electricpower/market-data/spot/bid_curves.html',
+    'Sec-Fetch-Dest': 'empty',
+    'Sec-Fetch-Mode': 'cors',
+    'Sec-Fetch-Site': 'same-origin',
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.5 Safari/605.1.15'
+}
 
 def create_db_table(conn):
     """
@@ -27,8 +64,9 @@ def create_db_table(conn):
         - id: 自動採番
         - dir_name: CSVのカテゴリー（例：spot_bid_curves）
         - date: 日付（YYYYMMDD形式）
-        - content: CSVの内容
+        - content: CSVの内容（content_codec で圧縮）
         - downloaded_at: ダウンロード日時
+        - content_codec: content の圧縮形式（'zstd' / 'zlib'、NULL は非圧縮）
     """
     create_table_sql = """
     CREATE TABLE IF NOT EXISTS downloaded_csv (
@@ -36,73 +74,177 @@ def create_db_table(conn):
         dir_name TEXT NOT NULL,
         date TEXT NOT NULL,
         content BLOB,
-        downloaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        downloaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        content_codec TEXT
     );
     """
     cursor = conn.cursor()
     cursor.execute(create_table_sql)
+    # 圧縮導入前に作成したテーブルには列を追加する（既存行は NULL = 非圧縮のまま）
+    columns = [row[1] for row in cursor.execute("PRAGMA table_info(downloaded_csv)")]
+    if "content_codec" not in columns:
+        cursor.execute("ALTER TABLE downloaded_csv ADD COLUMN content_codec TEXT")
     conn.commit()
 
-def insert_csv(conn, dir_name, date, content):
+def compress_content(content):
     """
-    ダウンロードしたCSVの内容をDBに挿入する。
+    CSV本文を圧縮し、(圧縮後のバイト列, 圧縮形式) を返す。
     """
-    insert_sql = "INSERT INTO downloaded_csv (dir_name, date, content) VALUES (?, ?, ?);"
-    cursor = conn.cursor()
-    cursor.execute(insert_sql, (dir_name, date.strftime("%Y%m%d"), content))
-    conn.commit()
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=3).compress(content), "zstd"
+    return zlib.compress(content, 6), "zlib"
 
-def download_csv(date, dir_name):
+def load_content(row):
     """
-    指定した日付とディレクトリ名に対するCSVをダウンロードし、その内容（バイナリ）を返す。
+    (content, content_codec) の行から元のCSV本文を返す。
+    """
+    content, codec = row
+    if codec is None:
+        return content
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstd で圧縮された行の読み込みには zstandard が必要です")
+        return zstandard.ZstdDecompressor().decompress(content)
+    if codec == "zlib":
+        return zlib.decompress(content)
+    raise ValueError(f"未知の圧縮形式です: {codec}")
+
+def insert_csv(conn, rows):
+    """
+    ダウンロードしたCSVの内容をまとめてDBに挿入する。
+
+    rows は (dir_name, date(YYYYMMDD), content) のタプルのリスト。content は圧縮して保存する。
+    1回の executemany と1回のコミットで挿入し、ファイルごとのコミットを避ける。
+    """
+    insert_sql = "INSERT INTO downloaded_csv (dir_name, date, content, content_codec) VALUES (?, ?, ?, ?);"
+    with conn:
+        conn.executemany(
+            insert_sql,
+            ((dir_name, date, *compress_content(content)) for dir_name, date, content in rows),
+        )
+
+def _build_request(date, dir_name):
+    """
+    CSV取得リクエストのクエリパラメータと日付文字列(YYYYMMDD)を返す。
     """
     date_str = date.strftime("%Y%m%d")
     params = {
         "dir": dir_name,
         "file": f"{dir_name}_{date_str}.csv"
     }
-    headers = {
-        'Accept': '*/*',
-        'Accept-Encoding': 'gzip, deflate, br',
-        'Accept-Language': 'ja',
-        'Cache-Control': 'no-cache',
-        'Connection': 'keep-alive',
-        'Host': 'www.jepx.jp',
-        'If-Modified-Since': 'Thu, 01 Jun 1970 00:00:00 GMT',
-        'Pragma': 'no-cache',
-        'Referer': 'https://www.jepx.jp/electricpower/market-data/spot/bid_curves.html',
-        'Sec-Fetch-Dest': 'empty',
-        'Sec-Fetch-Mode': 'cors',
-        'Sec-Fetch-Site': 'same-origin',
-        'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.5 Safari/605.1.15'
-    }
+    return params, date_str
+
+def _create_session():
+    """
+    共通ヘッダーと同時接続数分のコネクションプールを設定した requests.Session を返す。
+    """
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    session.mount("https://", HTTPAdapter(pool_maxsize=MAX_CONCURRENT_REQUESTS))
+    return session
+
+def download_csv(date, dir_name, session=None):
+    """
+    指定した日付とディレクトリ名に対するCSVをダウンロードし、その内容（バイナリ）を返す。
+    session を渡した場合はそのセッション（keep-alive 接続）を使い回す。
+    """
+    params, date_str = _build_request(date, dir_name)
+    try:
+        if session is None:
+            with _create_session() as own_session:
+                return _get_csv(own_session, params, dir_name, date_str)
+        return _get_csv(session, params, dir_name, date_str)
+    except Exception as e:
+        print(f"Error downloading {dir_name}_{date_str}.csv: {e}")
+        return None
+
+def _get_csv(session, params, dir_name, date_str):
+    """
+    CSVを1件取得する。HTTP 429 の場合は Retry-After（なければ指数バックオフ）だけ待って再試行する。
+    """
+    for attempt in range(MAX_RETRIES_ON_429 + 1):
+        response = session.get(BASE_URL, params=params, timeout=(10, 60))
+        if response.status_code == 429 and attempt < MAX_RETRIES_ON_429:
+            retry_after = response.headers.get("Retry-After", "")
+            wait = int(retry_after) if retry_after.isdigit() else 2 ** (attempt + 1)
+            print(f"Rate limited on {dir_name}_{date_str}.csv, retrying in {wait} seconds...")
+            time.sleep(wait)
+            continue
+        if response.status_code == 200:
+            print(f"Downloaded: {dir_name}_{date_str}.csv")
+            return response.content
+        print(f"Failed to download {dir_name}_{date_str}.csv: Status code {response.status_code}")
+        return None
+
+async def download_csv_async(client, date, dir_name):
+    """
+    download_csv の httpx.AsyncClient 版。HTTP 429 の扱いも同じ。
+    """
+    params, date_str = _build_request(date, dir_name)
     try:
-        with requests.Session() as session:
-            response = session.get(BASE_URL, params=params, headers=headers)
+        for attempt in range(MAX_RETRIES_ON_429 + 1):
+            response = await client.get(BASE_URL, params=params)
+            if response.status_code == 429 and attempt < MAX_RETRIES_ON_429:
+                retry_after = response.headers.get("Retry-After", "")
+                wait = int(retry_after) if retry_after.isdigit() else 2 ** (attempt + 1)
+                print(f"Rate limited on {dir_name}_{date_str}.csv, retrying in {wait} seconds...")
+                await asyncio.sleep(wait)
+                continue
             if response.status_code == 200:
                 print(f"Downloaded: {dir_name}_{date_str}.csv")
                 return response.content
-            else:
-                print(f"Failed to download {dir_name}_{date_str}.csv: Status code {response.status_code}")
-                return None
+            print(f"Failed to download {dir_name}_{date_str}.csv: Status code {response.status_code}")
+            return None
     except Exception as e:
         print(f"Error downloading {dir_name}_{date_str}.csv: {e}")
         return None
 
+async def _download_one(fetch, semaphore, date, dir_name):
+    """
+    セマフォで同時実行数を制限しながら1件ダウンロードする。
+    取得前に短い揺らぎを入れ、リクエストが同時に集中しないようにする。
+    """
+    async with semaphore:
+        await asyncio.sleep(random.uniform(0.5, 1.5))
+        content = await fetch(date, dir_name)
+    return dir_name, date, content
+
+async def _download_all(start_date, end_date):
+    """
+    期間内の (日付, カテゴリー) ごとにタスクを作り、並行してダウンロードする。
+    結果は (dir_name, date, content) のリストで、日付・カテゴリー順に並ぶ。
+    """
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    dates = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+    pairs = [(date, dir_name) for date in dates for dir_name in DIR_NAMES]
+
+    if httpx is not None:
+        limits = httpx.Limits(max_keepalive_connections=MAX_CONCURRENT_REQUESTS)
+        timeout = httpx.Timeout(60, connect=10)
+        # HTTP/2 では接続固有のヘッダーは使えないため除く
+        headers = {k: v for k, v in HEADERS.items() if k not in ('Connection', 'Host')}
+        async with httpx.AsyncClient(http2=True, limits=limits, timeout=timeout, headers=headers) as client:
+            fetch = lambda date, dir_name: download_csv_async(client, date, dir_name)
+            return await asyncio.gather(*(_download_one(fetch, semaphore, d, n) for d, n in pairs))
+
+    with _create_session() as session:
+        fetch = lambda date, dir_name: asyncio.to_thread(download_csv, date, dir_name, session)
+        return await asyncio.gather(*(_download_one(fetch, semaphore, d, n) for d, n in pairs))
+
 def download_files(start_date, end_date, conn):
     """
     指定した期間内の日付について、各カテゴリーのCSVをダウンロードし、DBへ保存する。
+
+    ダウンロードは1つのセッションを共有して最大 MAX_CONCURRENT_REQUESTS 件ずつ並行に行い、
+    日ごとの固定スリープの代わりに同時実行数の上限でサーバーへの負荷を抑える。
     """
-    current_date = start_date
-    while current_date <= end_date:
-        for dir_name in DIR_NAMES:
-            content = download_csv(current_date, dir_name)
-            if content is not None:
-                insert_csv(conn, dir_name, current_date, content)
-        sleep_time = random.randint(10, 20)
-        print(f"Sleeping for {sleep_time} seconds...")
-        time.sleep(sleep_time)
-        current_date += timedelta(days=1)
+    results = asyncio.run(_download_all(start_date, end_date))
+    rows = [
+        (dir_name, date.strftime("%Y%m%d"), content)
+        for dir_name, date, content in results
+        if content is not None
+    ]
+    insert_csv(conn, rows)
 
 def parse_args():
     parser = argparse.ArgumentParser(
@@ -122,13 +264,23 @@ def main():
     start_date_str, end_date_str = interactive_input()
 
     try:
-        start_date = datetime.strptime(start_date_str, "%Y-%m-%d")
-        end_date = datetime.strptime(end_date_str, "%Y-%m-%d")
+        start_date = datetime.fromisoformat(start_date_str)
+        end_date = datetime.fromisoformat(end_date_str)
     except ValueError:
         print("Error: Dates must be in YYYY-MM-DD format.")
         sys.exit(1)
+
+    # uvloop があれば標準のイベントループより軽いループで実行する
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
     
     conn = sqlite3.connect(DB_PATH)
+    # WAL モードでは synchronous=NORMAL でも整合性が保たれ、コミット時の fsync を減らせる
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
     create_db_table(conn)
     
     download_files(start_date, end_date, conn)
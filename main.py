@@ -12,10 +12,8 @@ import os
 import sys
 import logging
 import argparse
-from datetime import datetime, date, timedelta
-from typing import Optional, List, Dict, Any
-import duckdb
-import pandas as pd
+from datetime import date, timedelta
+from typing import TYPE_CHECKING, Optional, List, Dict, Any
 
 # ロギング設定
 logging.basicConfig(
@@ -24,24 +22,15 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# モジュールのインポート
-try:
-    from cli.menu import Menu
-    from data_sources.tso.unified_downloader import UnifiedTSODownloader
-    from data_sources.tso.db_importer import TSODataImporter
-    from db.duckdb_connection import DuckDBConnection
-    from data_sources.jepx.jepx_da_price import JEPXDAPriceDownloader
-    from data_sources.jepx.jepx_bid import JEPXBidDownloader
-except ImportError as e:
-    logger.error(f"モジュールのインポートエラー: {e}")
-    logger.info("プロジェクトのルートディレクトリを Python パスに追加します")
-    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-    from cli.menu import Menu
-    from data_sources.tso.unified_downloader import UnifiedTSODownloader
-    from data_sources.tso.db_importer import TSODataImporter
+# プロジェクトのルートディレクトリをパスに追加してから、1回だけインポートする
+project_root = os.path.dirname(os.path.abspath(__file__))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+# duckdb / pandas を読み込む各モジュールはサブコマンドで必要になった時点でインポートし、
+# --help や引数エラー時の起動を軽くする
+if TYPE_CHECKING:
     from db.duckdb_connection import DuckDBConnection
-    from data_sources.jepx.jepx_da_price import JEPXDAPriceDownloader
-    from data_sources.jepx.jepx_bid import JEPXBidDownloader
 
 class PowerMarketPortal:
     """電力市場データポータルのメインクラス"""
@@ -54,19 +43,32 @@ class PowerMarketPortal:
             db_path: データベースファイルのパス。Noneの場合、各接続で.env等から解決される。
         """
         self.db_path = db_path # Store db_path; None means DuckDBConnection will resolve via .env
-        logger.info(f"PowerMarketPortal initialized. Provided db_path: {self.db_path}. "
-                    f"If None, connection will use .env or default.")
-        # self.db = None # This instance variable seems unused as connections are typically per-method.
-    
-    def __del__(self):
-        """デストラクタ - インスタンスが破棄される際にDB接続を閉じる"""
-        # with文使用に変更したため、close不要
-        pass
+        self._db: Optional["DuckDBConnection"] = None
+        logger.info("PowerMarketPortal initialized. Provided db_path: %s. "
+                    "If None, connection will use .env or default.", self.db_path)
+
+    @property
+    def db(self) -> "DuckDBConnection":
+        """各ダウンローダー・インポーターで共有するDB接続（初回参照時に作成する）"""
+        if self._db is None:
+            from db.duckdb_connection import DuckDBConnection
+            self._db = DuckDBConnection(self.db_path)
+        return self._db
                 
     def close(self):
-        """明示的にリソースを解放するメソッド"""
-        # with文使用に変更したため、close不要
-        pass
+        """
+        共有DB接続（cursor）を閉じる。
+
+        閉じた後もポータルは使用でき、次の操作で接続が開き直される。
+        """
+        if self._db is not None:
+            self._db.close()
+
+    def __enter__(self) -> "PowerMarketPortal":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
     
     def download_tso_data(self, start_date: date, end_date: date, tso_ids: List[str], url_type: str = "demand") -> int:
         """
@@ -83,25 +85,24 @@ class PowerMarketPortal:
         """
         if not tso_ids:
             logger.error("TSOエリアIDが指定されていません。少なくとも1つのエリアを指定してください。")
-            print("[ERROR] TSOエリアIDが指定されていません。少なくとも1つのエリアを指定してください。")
             return 0
             
-        logger.info(f"TSOデータのダウンロード（{start_date}～{end_date}）, url_type={url_type}, tso_ids={tso_ids}")
+        logger.info("TSOデータのダウンロード（%s～%s）, url_type=%s, tso_ids=%s", start_date, end_date, url_type, tso_ids)
         imported_rows = 0
         
         try:
-            with TSODataImporter() as importer:
+            from data_sources.tso.db_importer import TSODataImporter
+            with TSODataImporter(db_connection=self.db) as importer:
                 imported_rows = importer.import_from_downloader(
                     tso_ids=tso_ids,
                     start_date=start_date,
                     end_date=end_date,
                     url_type=url_type
                 )
-            logger.info(f"{imported_rows}行のTSOデータを保存しました")
+            logger.info("%d行のTSOデータを保存しました", imported_rows)
             return imported_rows
         except Exception as e:
-            logger.error(f"TSOデータのダウンロード中にエラーが発生: {e}")
-            print(f"[ERROR] TSOデータのダウンロード中にエラーが発生: {e}")
+            logger.error("TSOデータのダウンロード中にエラーが発生: %s", e)
             return 0
     
     def download_jepx_price(self, url: Optional[str] = None) -> int:
@@ -115,17 +116,18 @@ class PowerMarketPortal:
             インポートされた行数
         """
         logger.info("JEPXスポット価格データのダウンロード")
-        logger.debug(f"[main.py download_jepx_price] received url: {url}")
+        logger.debug("[main.py download_jepx_price] received url: %s", url)
         
-        with JEPXDAPriceDownloader() as downloader:
+        from data_sources.jepx.jepx_da_price import JEPXDAPriceDownloader
+        with JEPXDAPriceDownloader(db_connection=self.db) as downloader:
             if url is None:
                 logger.debug("[main.py download_jepx_price] calling fetch_and_store without url argument")
                 rows = downloader.fetch_and_store()
             else:
-                logger.debug(f"[main.py download_jepx_price] calling fetch_and_store with url: {url}")
+                logger.debug("[main.py download_jepx_price] calling fetch_and_store with url: %s", url)
                 rows = downloader.fetch_and_store(url)
             
-        logger.info(f"{rows}行のJEPXスポット価格データを保存しました")
+        logger.info("%d行のJEPXスポット価格データを保存しました", rows)
         return rows
     
     def download_jepx_bid_data(self):
@@ -139,8 +141,8 @@ class PowerMarketPortal:
         end_date_str = input("Enter end date (YYYY-MM-DD): ")
         
         try:
-            start_date = datetime.strptime(start_date_str, "%Y-%m-%d").date()
-            end_date = datetime.strptime(end_date_str, "%Y-%m-%d").date()
+            start_date = date.fromisoformat(start_date_str)
+            end_date = date.fromisoformat(end_date_str)
         except ValueError:
             logger.error("日付の形式が不正です。YYYY-MM-DD 形式で入力してください。")
             print("Error: Dates must be in YYYY-MM-DD format.")
@@ -152,44 +154,36 @@ class PowerMarketPortal:
             return
 
         try:
+            from data_sources.jepx.jepx_bid import JEPXBidDownloader
             with JEPXBidDownloader(db_path=self.db_path) as downloader:
                 downloader.download_and_save(start_date, end_date)
-            logger.info(f"JEPX入札データのダウンロードと保存が完了しました ({start_date_str} から {end_date_str})。")
+            logger.info("JEPX入札データのダウンロードと保存が完了しました (%s から %s)。", start_date_str, end_date_str)
             print("Download and database insertion completed.")
         except Exception as e:
-            logger.error(f"JEPX入札データの処理中にエラーが発生しました: {e}", exc_info=True)
+            logger.error("JEPX入札データの処理中にエラーが発生しました: %s", e, exc_info=True)
             print(f"An error occurred during JEPX bid data processing: {e}")
 
     def interactive_menu(self):
         """インタラクティブメニューを表示"""
         # メニュークラスは内部で独自のPowerMarketPortalを生成するため、
         # 依存性を外すためにシンプルなMenuの呼び出しに変更
+        from cli.menu import Menu
         menu = Menu()
         menu.run()
 
 def display_tso_choices():
     """TSO選択肢を表示して選択用のマッピングを返します"""
-    tso_ids = {
-        "hokkaido": {"name": "Hokkaido Electric Power Network", "area_code": "1"},
-        "tohoku": {"name": "Tohoku Electric Power Network", "area_code": "2"},
-        "tepco": {"name": "TEPCO Power Grid", "area_code": "3"},
-        "chubu": {"name": "Chubu Electric Power Grid", "area_code": "4"},
-        "hokuriku": {"name": "Hokuriku Electric Power Company", "area_code": "5"},
-        "kansai": {"name": "Kansai Electric Power", "area_code": "6"},
-        "chugoku": {"name": "Chugoku Electric Power", "area_code": "7"},
-        "shikoku": {"name": "Shikoku Electric Power Company", "area_code": "8"},
-        "kyushu": {"name": "Kyushu Electric Power", "area_code": "9"}
-    }
-    
     print("\nTSO Area Selection:")
     print("-" * 60)
     print(f"{'No.':<4} {'Area Code':<10} {'TSO Name':<30}")
     print("-" * 60)
     
+    from cli.menu import TSO_MENU_ITEMS
+
     tso_choice_map = {}
     
     # 番号付きでTSOリストを表示
-    for i, (tso_id, info) in enumerate(sorted(tso_ids.items(), key=lambda x: x[1]['area_code']), 1):
+    for i, (tso_id, info) in enumerate(TSO_MENU_ITEMS, 1):
         print(f"{i:<4} {info['area_code']:<10} {info['name']:<30}")
         tso_choice_map[str(i)] = tso_id
     
@@ -207,9 +201,38 @@ def get_tso_selection(tso_choice_map):
         else:
             print(f"Invalid selection. Please enter a number between 1-{len(tso_choice_map)}")
 
+def run_tso_data(portal: PowerMarketPortal, args: argparse.Namespace) -> int:
+    """tso-data コマンド: TSO需要・供給データをダウンロードする"""
+    # TSO IDが指定されていない場合はインタラクティブに選択
+    tso_ids = args.tso_ids
+    if not tso_ids:
+        tso_choice_map = display_tso_choices()
+        tso_ids = get_tso_selection(tso_choice_map)
+        
+    print(f"Downloading TSO data from {args.start_date} to {args.end_date} for areas: {', '.join(tso_ids)}...")
+    rows = portal.download_tso_data(
+        start_date=args.start_date,
+        end_date=args.end_date,
+        tso_ids=tso_ids
+    )
+    print(f"Successfully imported {rows} rows of TSO data")
+    return 0
+
+def run_jepx_price(portal: PowerMarketPortal, args: argparse.Namespace) -> int:
+    """jepx-price コマンド: JEPXスポット価格をダウンロードする"""
+    portal.download_jepx_price(url=args.url)
+    return 0
+
+def run_menu(portal: PowerMarketPortal, args: argparse.Namespace) -> int:
+    """menu コマンド（サブコマンド省略時も同じ）: インタラクティブメニューを表示する"""
+    portal.interactive_menu()
+    return 0
+
 def parse_args():
     """コマンドライン引数をパース"""
     parser = argparse.ArgumentParser(description="電力市場データポータル")
+    # サブコマンドを省略した場合はメニューを表示する
+    parser.set_defaults(func=run_menu)
     
     # 共通のデータベースパスオプション
     parser.add_argument(
@@ -225,13 +248,13 @@ def parse_args():
     tso_data_parser = subparsers.add_parser("tso-data", help="TSO需要・供給データをダウンロード")
     tso_data_parser.add_argument(
         "--start-date",
-        type=lambda d: datetime.strptime(d, "%Y-%m-%d").date(),
+        type=date.fromisoformat,
         help="開始日（YYYY-MM-DD形式）",
         default=(date.today() - timedelta(days=30)),
     )
     tso_data_parser.add_argument(
         "--end-date",
-        type=lambda d: datetime.strptime(d, "%Y-%m-%d").date(),
+        type=date.fromisoformat,
         help="終了日（YYYY-MM-DD形式）",
         default=(date.today() - timedelta(days=1)),
     )
@@ -242,6 +265,7 @@ def parse_args():
         required=False,
         help="処理対象のTSO ID（例: tepco hokkaido）- 省略した場合はインタラクティブに選択",
     )
+    tso_data_parser.set_defaults(func=run_tso_data)
     
     # JEPXスポット価格ダウンロード
     jepx_price_parser = subparsers.add_parser("jepx-price", help="JEPXスポット価格をダウンロード")
@@ -250,9 +274,11 @@ def parse_args():
         type=str,
         help="JEPXスポット価格データのURL（省略時はデフォルト）",
     )
+    jepx_price_parser.set_defaults(func=run_jepx_price)
     
     # インタラクティブメニュー
     menu_parser = subparsers.add_parser("menu", help="インタラクティブメニューを表示")
+    menu_parser.set_defaults(func=run_menu)
     
     return parser.parse_args()
 
@@ -261,39 +287,10 @@ def main():
     args = parse_args()
     
     # ポータルインスタンスを作成（データベースパスを指定）
-    portal = PowerMarketPortal(db_path=args.db_path if hasattr(args, 'db_path') else None)
-    
-    try:
-        if args.command == "tso-data":
-            # TSO IDが指定されていない場合はインタラクティブに選択
-            tso_ids = args.tso_ids
-            if not tso_ids:
-                tso_choice_map = display_tso_choices()
-                tso_ids = get_tso_selection(tso_choice_map)
-                
-            print(f"Downloading TSO data from {args.start_date} to {args.end_date} for areas: {', '.join(tso_ids)}...")
-            rows = portal.download_tso_data(
-                start_date=args.start_date,
-                end_date=args.end_date,
-                tso_ids=tso_ids
-            )
-            print(f"Successfully imported {rows} rows of TSO data")
-        elif args.command == "jepx-price":
-            # JEPXスポット価格のダウンロード
-            portal.download_jepx_price(url=args.url if hasattr(args, 'url') else None)
-        elif args.command == "menu" or not args.command:
-            # インタラクティブメニューの表示
-            portal.interactive_menu()
-        else:
-            logger.error(f"不明なコマンド: {args.command}")
-            return 1
-        
-        return 0
-    finally:
-        # 明示的にデータベース接続を閉じる
-        if portal:
-            portal.close()
-            print("[INFO] main.py: メイン処理完了後にデータベース接続を閉じました")
+    # with 文を抜けるとデータベース接続を閉じる
+    with PowerMarketPortal(db_path=args.db_path) as portal:
+        # 各サブコマンドの処理関数は parse_args で set_defaults(func=...) により設定済み
+        return args.func(portal, args)
 
 if __name__ == "__main__":
     sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+import sys
+import os
+
+import pandas as pd
+import pytest
+
+# Add the project root to the Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from db.duckdb_connection import DuckDBConnection, close_pooled_connections
+
+
+@pytest.fixture(autouse=True)
+def _release_pooled_connections():
+    yield
+    close_pooled_connections()
+
+
+def _create_table(db: DuckDBConnection, table: str = "t") -> None:
+    db.execute_query(f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            master_key VARCHAR PRIMARY KEY,
+            value INTEGER,
+            note VARCHAR DEFAULT 'n/a'
+        )
+    """)
+
+
+def test_save_dataframe_append_without_duplicate_check(tmp_path):
+    """重複チェックなしの場合は列順に関係なく全行が追加される"""
+    with DuckDBConnection(tmp_path / "test.duckdb") as db:
+        _create_table(db)
+        df = pd.DataFrame({"value": [1, 2, 3], "master_key": ["a", "b", "c"]})
+
+        inserted = db.save_dataframe(df, "t", check_duplicate_master_key=False)
+
+        assert inserted == 3
+        rows = db.execute_query("SELECT master_key, value, note FROM t ORDER BY master_key").fetchall()
+        assert rows == [("a", 1, "n/a"), ("b", 2, "n/a"), ("c", 3, "n/a")]
+
+
+def test_save_dataframe_skips_existing_and_duplicate_master_keys(tmp_path):
+    """既存キーとバッチ内の重複キーは挿入されず、挿入行数に含まれない"""
+    with DuckDBConnection(tmp_path / "test.duckdb") as db:
+        _create_table(db)
+        db.save_dataframe(pd.DataFrame({"master_key": ["a"], "value": [1]}), "t")
+
+        df = pd.DataFrame({"master_key": ["a", "b", "b", "c"], "value": [10, 2, 20, 3]})
+        inserted = db.save_dataframe(df, "t")
+
+        assert inserted == 2
+        rows = db.execute_query("SELECT master_key, value FROM t ORDER BY master_key").fetchall()
+        assert rows == [("a", 1), ("b", 2), ("c", 3)]
+
+
+def test_save_dataframe_large_frame_goes_through_arrow(tmp_path):
+    """Arrow 変換の閾値を超える DataFrame も重複チェック付きで保存できる"""
+    from db.duckdb_connection import ARROW_CONVERSION_MIN_ROWS
+
+    n = ARROW_CONVERSION_MIN_ROWS + 5
+    with DuckDBConnection(tmp_path / "test.duckdb") as db:
+        _create_table(db)
+        db.save_dataframe(pd.DataFrame({"master_key": ["k0"], "value": [0]}), "t")
+
+        df = pd.DataFrame({"master_key": [f"k{i}" for i in range(n)], "value": range(n)})
+        inserted = db.save_dataframe(df, "t")
+
+        assert inserted == n - 1
+        assert db.execute_query("SELECT COUNT(*), SUM(value) FROM t").fetchone() == (n, sum(range(n)))
+
+
+def test_save_dataframe_in_chunks(tmp_path):
+    """chunk_rows ごとに分割しても全行が1回の呼び出しで保存される"""
+    with DuckDBConnection(tmp_path / "test.duckdb") as db:
+        _create_table(db)
+        df = pd.DataFrame({"master_key": [f"k{i}" for i in range(10)], "value": range(10)})
+
+        inserted = db.save_dataframe(df, "t", chunk_rows=3)
+
+        assert inserted == 10
+        assert db.execute_query("SELECT COUNT(*) FROM t").fetchone() == (10,)
+
+
+def test_save_dataframe_rolls_back_all_chunks_on_error(tmp_path):
+    """途中のチャンクで失敗した場合は先に挿入したチャンクも取り消される"""
+    with DuckDBConnection(tmp_path / "test.duckdb") as db:
+        _create_table(db)
+        df = pd.DataFrame({"master_key": ["a", "b", "c", "d"], "value": ["1", "2", "x", "4"]})
+
+        with pytest.raises(Exception):
+            db.save_dataframe(df, "t", check_duplicate_master_key=False, chunk_rows=2)
+
+        assert db.execute_query("SELECT COUNT(*) FROM t").fetchone() == (0,)
+
+
+def test_connections_to_same_database_share_pooled_connection(tmp_path):
+    """同じDBへの複数インスタンスは1つの親接続を共有し、close 後も他方は使える"""
+    db_path = tmp_path / "test.duckdb"
+    first = DuckDBConnection(db_path)
+    second = DuckDBConnection(db_path)
+    try:
+        _create_table(first)
+        first.save_dataframe(pd.DataFrame({"master_key": ["a"], "value": [1]}), "t")
+        first.close()
+
+        assert second.execute_query("SELECT COUNT(*) FROM t").fetchone() == (1,)
+    finally:
+        second.close()
+        close_pooled_connections()
+
+    # ロック解放後は別の設定でも開き直せる
+    with DuckDBConnection(db_path, read_only=True) as db:
+        assert db.execute_query("SELECT COUNT(*) FROM t").fetchone() == (1,)
+
+
+def test_reopen_read_only_after_read_write_close(tmp_path):
+    """書き込み接続を close した後は、close_pooled_connections なしで read_only で開き直せる"""
+    db_path = tmp_path / "test.duckdb"
+    with DuckDBConnection(db_path) as db:
+        _create_table(db)
+        db.save_dataframe(pd.DataFrame({"master_key": ["a"], "value": [1]}), "t")
+
+    with DuckDBConnection(db_path, read_only=True) as db:
+        assert db.execute_query("SELECT COUNT(*) FROM t").fetchone() == (1,)
+
+    # read_only の親接続が閉じられていれば、再び書き込み接続を開ける
+    with DuckDBConnection(db_path) as db:
+        db.save_dataframe(pd.DataFrame({"master_key": ["b"], "value": [2]}), "t")
+        assert db.execute_query("SELECT COUNT(*) FROM t").fetchone() == (2,)
+
+
+def test_read_only_connection_shares_open_read_write_connection(tmp_path):
+    """書き込み接続を開いている間の read_only 接続は、その親接続を共有する"""
+    db_path = tmp_path / "test.duckdb"
+    with DuckDBConnection(db_path) as rw:
+        _create_table(rw)
+        rw.save_dataframe(pd.DataFrame({"master_key": ["a"], "value": [1]}), "t")
+        with DuckDBConnection(db_path, read_only=True) as ro:
+            assert ro.execute_query("SELECT COUNT(*) FROM t").fetchone() == (1,)
+        # read_only 側の close で書き込み側の親接続は閉じない
+        assert rw.execute_query("SELECT COUNT(*) FROM t").fetchone() == (1,)
+
+
+def test_table_exists_uses_cached_catalog(tmp_path):
+    """作成直後のテーブルも検出され、DROP 後は invalidate_catalog_cache で反映される"""
+    with DuckDBConnection(tmp_path / "test.duckdb") as db:
+        assert not db.table_exists("t")
+        _create_table(db)
+        assert db.table_exists("t")
+
+        db.execute_query("DROP TABLE t")
+        db.invalidate_catalog_cache()
+        assert not db.table_exists("t")
+
+
+def test_save_dataframe_excludes_null_master_keys(tmp_path):
+    """master_key が NULL の行は除外され、残りの行だけが保存される"""
+    with DuckDBConnection(tmp_path / "test.duckdb") as db:
+        _create_table(db)
+        df = pd.DataFrame({"master_key": ["a", None, "c"], "value": [1, 2, 3]})
+
+        inserted = db.save_dataframe(df, "t")
+
+        assert inserted == 2
+        rows = db.execute_query("SELECT master_key, value FROM t ORDER BY master_key").fetchall()
+        assert rows == [("a", 1), ("c", 3)]
+
+
+def test_connect_config_defaults_can_be_overridden(tmp_path):
+    """threads などは既定値が設定され、config で明示した値が優先される"""
+    with DuckDBConnection(tmp_path / "test.duckdb") as db:
+        threads = db.execute_query("SELECT current_setting('threads')").fetchone()[0]
+        assert threads >= 1
+        assert db.execute_query("SELECT current_setting('preserve_insertion_order')").fetchone() == (False,)
+    close_pooled_connections()
+
+    with DuckDBConnection(tmp_path / "test.duckdb", config={"threads": 1}) as db:
+        assert db.execute_query("SELECT current_setting('threads')").fetchone() == (1,)
+
+
+def test_save_dataframe_indexes_master_key_when_not_constrained(tmp_path):
+    """master_key に制約のないテーブルには一意索引が作成され、主キーがあれば作成されない"""
+    with DuckDBConnection(tmp_path / "test.duckdb") as db:
+        _create_table(db)
+        db.execute_query("CREATE TABLE plain (master_key VARCHAR, value INTEGER)")
+
+        db.save_dataframe(pd.DataFrame({"master_key": ["a"], "value": [1]}), "t")
+        db.save_dataframe(pd.DataFrame({"master_key": ["a"], "value": [1]}), "plain")
+        inserted = db.save_dataframe(pd.DataFrame({"master_key": ["a", "b"], "value": [1, 2]}), "plain")
+
+        assert inserted == 1
+        indexes = db.execute_query("SELECT table_name, is_unique FROM duckdb_indexes()").fetchall()
+        assert indexes == [("plain", True)]
+
+
+def test_execute_arrow_returns_arrow_table(tmp_path):
+    """execute_arrow はクエリ結果を pyarrow.Table で返す"""
+    with DuckDBConnection(tmp_path / "test.duckdb") as db:
+        _create_table(db)
+        db.save_dataframe(pd.DataFrame({"master_key": ["a", "b"], "value": [1, 2]}), "t")
+
+        table = db.execute_arrow("SELECT master_key, value FROM t WHERE value >= ? ORDER BY master_key", (1,))
+
+        assert table.column_names == ["master_key", "value"]
+        assert table.to_pydict() == {"master_key": ["a", "b"], "value": [1, 2]}
+
+
+def test_transaction_rolls_back_every_table_on_error(tmp_path):
+    """transaction() 内の複数テーブルへの保存は、途中で失敗するとすべて取り消される"""
+    with DuckDBConnection(tmp_path / "test.duckdb") as db:
+        _create_table(db, "t1")
+        _create_table(db, "t2")
+
+        with pytest.raises(Exception):
+            with db.transaction():
+                db.save_dataframe(pd.DataFrame({"master_key": ["a"], "value": [1]}), "t1")
+                db.save_dataframe(pd.DataFrame({"master_key": ["b"], "value": ["x"]}), "t2")
+
+        assert db.execute_query("SELECT COUNT(*) FROM t1").fetchone() == (0,)
+
+        with db.transaction():
+            db.save_dataframe(pd.DataFrame({"master_key": ["a"], "value": [1]}), "t1")
+            db.save_dataframe(pd.DataFrame({"master_key": ["b"], "value": [2]}), "t2")
+
+        assert db.execute_query("SELECT COUNT(*) FROM t1").fetchone() == (1,)
+        assert db.execute_query("SELECT COUNT(*) FROM t2").fetchone() == (1,)
+
+
+def test_save_dataframe_with_existing_duplicate_master_keys(tmp_path):
+    """既存データに重複キーがあっても索引作成で失敗せず、transaction() 内でも保存できる"""
+    with DuckDBConnection(tmp_path / "test.duckdb") as db:
+        db.execute_query("CREATE TABLE dup (master_key VARCHAR, value INTEGER)")
+        db.execute_query("INSERT INTO dup VALUES ('a', 1), ('a', 2)")
+
+        with db.transaction():
+            inserted = db.save_dataframe(pd.DataFrame({"master_key": ["a", "b"], "value": [3, 4]}), "dup")
+
+        assert inserted == 1
+        assert db.execute_query("SELECT COUNT(*) FROM dup").fetchone() == (3,)
+        assert db.execute_query("SELECT COUNT(*) FROM duckdb_indexes() WHERE table_name = 'dup'").fetchone() == (0,)
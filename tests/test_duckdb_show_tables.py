@@ -2,10 +2,13 @@ import duckdb
 
 def main():
     db_path = '/Volumes/MacMiniSSD/powermarketdata/power_market_data'
-    con = duckdb.connect(db_path)
-    tables = con.execute('PRAGMA show_tables;').fetchall()
+    # 一覧の取得だけなので読み取り専用で開き、書き込み中のプロセスとロックを競合させない
+    con = duckdb.connect(db_path, read_only=True)
+    tables = con.execute(
+        "SELECT table_name FROM duckdb_tables() WHERE schema_name = 'main' ORDER BY table_name"
+    ).fetchall()
     print(f"[INFO] DB({db_path})のテーブル一覧: {[t[0] for t in tables]}")
     con.close()
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    main()
@@ -1,91 +1,149 @@
 #!/usr/bin/env python3
+import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import sys
-import time
-import random
 import argparse
-import csv
+import io
 import json
 import os
+import importlib.util
 from pathlib import Path
 
 # Add the project root to the Python path
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, project_root)
 
+# data_sources.jepx パッケージの __init__ は DuckDB などを読み込むため、
+# 標準ライブラリのみに依存する rate_limit モジュールをファイルから直接読み込む
+_spec = importlib.util.spec_from_file_location(
+    "jepx_rate_limit", os.path.join(project_root, "data_sources", "jepx", "rate_limit.py")
+)
+_rate_limit = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_rate_limit)
+AdaptiveDelay = _rate_limit.AdaptiveDelay
+
 # 定数設定
 BASE_URL = "https://www.jepx.jp/js/csv_read.php"
 DIR_NAMES = ["spot_bid_curves", "spot_splitting_areas"]
+CSV_COLUMNS = ["date", "time_slot", "price", "sell_qty", "buy_qty", "area_seq"]
+# 同時ダウンロード数の上限
+MAX_WORKERS = 8
+
+HEADERS = {
+    'Accept': '*/*',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'Accept-Language': 'ja',
+    'Cache-Control': 'no-cache',
+    'Connection': 'keep-alive',
+    'Host': 'www.jepx.jp',
+    'If-Modified-Since': 'Thu, 01 Jun 1970 00:00:00 GMT',
+    'Pragma': 'no-cache',
+    'Referer': 'https://www.jepx.jp/electricpower/market-data/spot/bid_curves.html',
+    'Sec-Fetch-Dest': 'empty',
+    'Sec-Fetch-Mode': 'cors',
+    'Sec-Fetch-Site': 'same-origin',
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.5 Safari/605.1.15'
+}
+
+# 全スレッドで共有するリクエスト間隔（429/5xx で広げ、成功が続くと縮める）
+DELAY = AdaptiveDelay()
+
+# 全スレッドで共有するセッション（keep-alive 接続を使い回す）。
+# ヘッダーは1回だけ設定し、一時的なサーバーエラーは指数バックオフで再試行する。
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=MAX_WORKERS,
+    pool_maxsize=2 * MAX_WORKERS,
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=(500, 502, 503, 504)),
+))
 
-def download_csv(date, dir_name):
+def download_csv(date_str, dir_name):
     """
-    指定した日付とディレクトリ名に対するCSVをダウンロードし、その内容（バイナリ）を返す。
+    指定した日付（YYYYMMDD）とディレクトリ名に対するCSVをダウンロードし、その内容（バイナリ）を返す。
     """
-    date_str = date.strftime("%Y%m%d")
     params = {
         "dir": dir_name,
         "file": f"{dir_name}_{date_str}.csv"
     }
-    headers = {
-        'Accept': '*/*',
-        'Accept-Encoding': 'gzip, deflate, br',
-        'Accept-Language': 'ja',
-        'Cache-Control': 'no-cache',
-        'Connection': 'keep-alive',
-        'Host': 'www.jepx.jp',
-        'If-Modified-Since': 'Thu, 01 Jun 1970 00:00:00 GMT',
-        'Pragma': 'no-cache',
-        'Referer': 'https://www.jepx.jp/electricpower/market-data/spot/bid_curves.html',
-        'Sec-Fetch-Dest': 'empty',
-        'Sec-Fetch-Mode': 'cors',
-        'Sec-Fetch-Site': 'same-origin',
-        'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.5 Safari/605.1.15'
-    }
     try:
-        with requests.Session() as session:
-            response = session.get(BASE_URL, params=params, headers=headers)
-            if response.status_code == 200:
-                print(f"Downloaded: {dir_name}_{date_str}.csv")
-                return response.content
-            else:
-                print(f"Failed to download {dir_name}_{date_str}.csv: Status code {response.status_code}")
-                return None
+        response = SESSION.get(BASE_URL, params=params)
+        DELAY.update(response.status_code, response.headers.get('Retry-After'))
+        if response.status_code == 200:
+            print(f"Downloaded: {dir_name}_{date_str}.csv")
+            return response.content
+        else:
+            print(f"Failed to download {dir_name}_{date_str}.csv: Status code {response.status_code}")
+            return None
     except Exception as e:
         print(f"Error downloading {dir_name}_{date_str}.csv: {e}")
+        DELAY.on_throttled()
         return None
 
 def process_csv_to_json(csv_text):
-    data = {}
-    reader = csv.reader(csv_text.splitlines())
-    for row in reader:
-        if len(row) < 6:
-            continue
-        date, time_slot, price, sell_qty, buy_qty, area_seq = row[0], row[1], row[2], row[3], row[4], row[5]
-        key = (date, time_slot, area_seq)
-        order = {"price": price, "sell_qty": sell_qty, "buy_qty": buy_qty}
-        if key not in data:
-            data[key] = {
-                "date": date,
-                "time_slot": time_slot,
-                "area_seq": area_seq,
-                "orders": [order]
-            }
-        else:
-            data[key]["orders"].append(order)
-    records = list(data.values())
+    """
+    入札曲線CSVを (日付, 時間帯, エリア) ごとに注文をまとめたJSON文字列に変換する。
+
+    CSVは pandas でまとめて読み込み、グループ化も行単位のループではなく groupby で行う。
+    6列目（エリア）を持たない行は対象外とする。
+    """
+    try:
+        df = pd.read_csv(
+            io.StringIO(csv_text),
+            header=None,
+            usecols=range(6),
+            names=CSV_COLUMNS,
+            dtype=str,
+            keep_default_na=False,
+        )
+    except pd.errors.EmptyDataError:
+        return json.dumps([], indent=2)
+    df = df[df["area_seq"] != ""]
+
+    orders = df[["price", "sell_qty", "buy_qty"]].to_dict("records")
+    # sort=False で初出順を保ち、キーごとの行位置から注文リストを組み立てる
+    groups = df.groupby(["date", "time_slot", "area_seq"], sort=False).indices
+    records = [
+        {
+            "date": date,
+            "time_slot": time_slot,
+            "area_seq": area_seq,
+            "orders": [orders[i] for i in positions],
+        }
+        for (date, time_slot, area_seq), positions in groups.items()
+    ]
     return json.dumps(records, indent=2)
 
+def _download_with_jitter(task):
+    """
+    リクエスト前に現在の間隔だけランダムな揺らぎを付けて待ってからダウンロードする。
+    ワーカー数の上限と合わせて、サーバーへのリクエストが一度に集中しないようにする。
+    """
+    date_str, dir_name = task
+    DELAY.sleep()
+    return download_csv(date_str, dir_name)
+
 def download_and_display(start_date, end_date):
     """
     指定した期間内の日付について、各カテゴリーのCSVをダウンロードし、その内容を表示する。
+
+    ダウンロードは最大 MAX_WORKERS 件を並行に行い、表示は日付・カテゴリー順のまま行う。
     """
-    current_date = start_date
-    while current_date <= end_date:
-        for dir_name in DIR_NAMES:
-            content = download_csv(current_date, dir_name)
+    # 日付文字列は日ごとに1回だけ作成し、全カテゴリーで使い回す
+    date_strs = [
+        f"{d.year:04d}{d.month:02d}{d.day:02d}"
+        for d in (start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1))
+    ]
+    tasks = [(date_str, dir_name) for date_str in date_strs for dir_name in DIR_NAMES]
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        # map は結果を投入順に返すため、表示順は逐次実行時と変わらない
+        for (date_str, dir_name), content in zip(tasks, executor.map(_download_with_jitter, tasks)):
             if content is not None:
-                print(f"--- {dir_name}_{current_date.strftime('%Y%m%d')}.csv ---")
+                print(f"--- {dir_name}_{date_str}.csv ---")
                 try:
                     text = content.decode('utf-8')
                 except UnicodeDecodeError:
@@ -94,10 +152,6 @@ def download_and_display(start_date, end_date):
                 print("JSON Output:")
                 print(json_output)
                 print()
-        sleep_time = random.randint(10, 20)
-        print(f"Sleeping for {sleep_time} seconds...")
-        time.sleep(sleep_time)
-        current_date += timedelta(days=1)
 
 def interactive_input():
     """Prompt the user interactively for start and end dates."""
@@ -109,8 +163,8 @@ def main():
     start_date_str, end_date_str = interactive_input()
 
     try:
-        start_date = datetime.strptime(start_date_str, "%Y-%m-%d")
-        end_date = datetime.strptime(end_date_str, "%Y-%m-%d")
+        start_date = datetime.fromisoformat(start_date_str)
+        end_date = datetime.fromisoformat(end_date_str)
     except ValueError:
         print("Error: Dates must be in YYYY-MM-DD format.")
         sys.exit(1)
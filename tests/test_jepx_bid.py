@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+import sys
+import os
+import json
+
+import pytest
+
+# Add the project root to the Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from db.duckdb_connection import close_pooled_connections
+from data_sources.jepx.jepx_bid import JEPXBidDownloader
+
+
+@pytest.fixture(autouse=True)
+def _release_pooled_connections():
+    yield
+    close_pooled_connections()
+
+
+@pytest.fixture
+def downloader(tmp_path):
+    with JEPXBidDownloader(str(tmp_path / "test.duckdb")) as d:
+        yield d
+
+
+def _bids(downloader, slot: int) -> list:
+    row = downloader.db.execute_query(
+        "SELECT bid FROM jepx_bid_data WHERE id = ?", (f"2025/04/01_{slot}_1",)
+    ).fetchone()
+    return json.loads(row[0])
+
+
+def test_save_csv(downloader):
+    content = (
+        "2025/04/01,1,10.0,100,0,1\n"
+        "2025/04/01,1,11.0,0,50,1\n"
+        "2025/04/01,2,12.0,200,0,1\n"
+    ).encode("utf-8")
+    assert downloader.save_csv(content) == 2
+    assert _bids(downloader, 1) == [
+        {"price": "10.0", "sell_qty": "100", "buy_qty": "0"},
+        {"price": "11.0", "sell_qty": "0", "buy_qty": "50"},
+    ]
+
+
+def test_save_csv_with_ragged_rows(downloader):
+    # 先頭行が7列でも、6列の行を読み飛ばさない
+    content = (
+        "2025/04/01,1,10.0,100,0,1,extra\n"
+        "2025/04/01,1,11.0,0,50,1\n"
+        "2025/04/01,2,12.0,200,0,1,extra,extra\n"
+    ).encode("utf-8")
+    assert downloader.save_csv(content) == 2
+    assert len(_bids(downloader, 1)) == 2
+    assert len(_bids(downloader, 2)) == 1
+
+
+def test_save_csv_with_short_first_row(downloader):
+    # 先頭行が6列未満 (タイトル行など) でも読み込める
+    content = (
+        "入札データ\n"
+        "\n"
+        "2025/04/01,1,10.0,100,0,1\n"
+        "2025/04/01,1,11.0,0\n"
+    ).encode("shift_jis")
+    assert downloader.save_csv(content) == 1
+    assert _bids(downloader, 1) == [{"price": "10.0", "sell_qty": "100", "buy_qty": "0"}]
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+import sys
+import os
+from datetime import date
+
+import pandas as pd
+import pytest
+
+# Add the project root and examples to the Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, "examples"))
+
+from db.duckdb_connection import DuckDBConnection, close_pooled_connections
+import tso_data_to_db
+
+
+@pytest.fixture(autouse=True)
+def _release_pooled_connections():
+    yield
+    close_pooled_connections()
+
+
+def _area_df(area_num: int, demand: list) -> pd.DataFrame:
+    """TSODataParser の出力と同じ形 (YYYYMMDD の date, 整数の slot, 英語の項目名)"""
+    return pd.DataFrame({
+        "date": ["20240401"] * len(demand),
+        "slot": list(range(1, len(demand) + 1)),
+        "area_demand": demand,
+        "solar_actual": [0.0] * len(demand),
+        "area_num": area_num,
+    })
+
+
+def test_wide_table_from_two_areas(tmp_path):
+    all_area_dfs = {
+        "hokkaido": _area_df(1, [300.0, 310.0, 320.0]),
+        # 東北は2スロット分しかない
+        "tohoku": _area_df(2, [800.0, 810.0]),
+    }
+
+    wide_df = tso_data_to_db.build_wide_df(all_area_dfs)
+
+    assert list(wide_df.columns) == tso_data_to_db.WIDE_COLUMNS
+    assert wide_df["master_key"].tolist() == ["20240401_01", "20240401_02", "20240401_03"]
+
+    with DuckDBConnection(tmp_path / "test.duckdb") as db:
+        tso_data_to_db.ensure_wide_table(db)
+        assert db.save_dataframe(wide_df, "tso_data") == 3
+
+        rows = db.execute_query(
+            'SELECT master_key, date, slot, "1_area_demand", "2_area_demand", "3_area_demand" '
+            "FROM tso_data ORDER BY slot"
+        ).fetchall()
+    assert rows == [
+        ("20240401_01", date(2024, 4, 1), 1, 300.0, 800.0, None),
+        ("20240401_02", date(2024, 4, 1), 2, 310.0, 810.0, None),
+        ("20240401_03", date(2024, 4, 1), 3, 320.0, None, None),
+    ]
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+import sys
+import os
+import io
+import zipfile
+from datetime import date
+
+import pytest
+
+# Add the project root to the Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from data_sources.tso.parser import TSODataParser
+
+
+def _csv(times) -> str:
+    lines = ["エリア需給実績", "DATE,TIME,エリア需要,太陽光発電実績"]
+    for i, t in enumerate(times, start=1):
+        lines.append(f"2024/04/01,{t},{i * 100},{i}")
+    return "\n".join(lines) + "\n"
+
+
+TIMES = {
+    "hh_mm": ["00:00", "00:30", "01:00"],
+    "hh_mm_ss": ["00:00:00", "00:30:00", "01:00:00"],
+}
+
+
+def _assert_slots(df):
+    assert df[["master_key", "slot", "area_demand", "solar_actual"]].values.tolist() == [
+        ["20240401_1", 1, 100, 1],
+        ["20240401_2", 2, 200, 2],
+        ["20240401_3", 3, 300, 3],
+    ]
+
+
+@pytest.mark.parametrize("times", TIMES.values(), ids=TIMES.keys())
+def test_parse_csv_keeps_time_slots(times):
+    df = TSODataParser().parse_data(_csv(times).encode("utf-8"), "tepco", date(2024, 4, 1))
+    _assert_slots(df)
+
+
+@pytest.mark.parametrize("times", TIMES.values(), ids=TIMES.keys())
+def test_parse_chubu_zip_keeps_time_slots(times):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        zf.writestr("eria_jukyu_202404_04.csv", _csv(times).encode("shift_jis"))
+    url = "https://example.com/eria_jukyu_2024.zip"
+    df = TSODataParser().parse_data(buf.getvalue(), "chubu", date(2024, 4, 1), url)
+    _assert_slots(df)